@@ -0,0 +1,96 @@
+"""
+Cached era background gradients
+
+The radial background only depends on the canvas size and the era base
+color, so the alpha falloff is built once per size as a NumPy array and the
+colored RGBA layer once per (width, height, base color). Generators copy the
+cached layer as their starting canvas instead of redrawing ~25 ellipses per
+token.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+
+def radial_alpha_falloff(width: int, height: int) -> np.ndarray:
+    """Alpha mask of the era background as an (height, width) uint8 array
+
+    Matches the concentric ellipses the generators used to draw per token
+    (ring spacing 10px, alpha fading from 30 to 5).
+    """
+    mask = Image.new('L', (width, height), 0)
+    draw = ImageDraw.Draw(mask)
+    center_x, center_y = width // 2, height // 2
+
+    for r in range(0, width // 2, 10):
+        alpha = max(5, 30 - r // 20)
+        draw.ellipse([center_x - r, center_y - r, center_x + r, center_y + r], fill=alpha)
+
+    return np.asarray(mask)
+
+
+class GradientCache:
+    """Thread-safe LRU cache of background layers keyed by (width, height, base color)"""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._layers = OrderedDict()
+        self._falloffs = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _falloff(self, width: int, height: int) -> np.ndarray:
+        key = (width, height)
+        if key not in self._falloffs:
+            # Only a handful of canvas sizes exist, bound it with the layer LRU
+            if len(self._falloffs) >= self.max_entries:
+                self._falloffs.clear()
+            self._falloffs[key] = radial_alpha_falloff(width, height)
+        return self._falloffs[key]
+
+    def get(self, width: int, height: int, base_color: Tuple[int, int, int]) -> Image.Image:
+        """Return the shared RGBA background layer; callers must copy before drawing"""
+        key = (width, height, tuple(base_color))
+
+        with self._lock:
+            layer = self._layers.get(key)
+            if layer is not None:
+                self._layers.move_to_end(key)
+                self.hits += 1
+                return layer
+
+            self.misses += 1
+            alpha = self._falloff(width, height)
+            pixels = np.zeros((height, width, 4), dtype=np.uint8)
+            covered = alpha > 0
+            pixels[covered, :3] = base_color
+            pixels[..., 3] = alpha
+            layer = Image.fromarray(pixels, 'RGBA')
+
+            self._layers[key] = layer
+            if len(self._layers) > self.max_entries:
+                self._layers.popitem(last=False)
+            return layer
+
+
+# Shared by every generator in the process
+gradient_cache = GradientCache()
+
+
+def era_background(width: int, height: int, base_color: Tuple[int, int, int],
+                   canvas: Optional[Image.Image] = None) -> Image.Image:
+    """Fresh RGBA canvas pre-filled with the cached radial background
+
+    Given a canvas (RGBA, same size, e.g. from the canvas pool) the
+    background is pasted into it instead of copied into a new image.
+    """
+    layer = gradient_cache.get(width, height, base_color)
+    if canvas is None:
+        return layer.copy()
+    canvas.paste(layer, (0, 0))
+    return canvas
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the fractal pattern renderers
+
+Times every draw_* method of AdvancedFractalGenerator, every draw_simple_*
+method of UltraOptimizedFractalGenerator and every create_fractal_organism
+organism type across fractal depths and canvas sizes, and compares the
+ImageDraw, NumPy scanline and (with Numba) JIT rasterizers on the same primitive buffers
+(geometry is built outside the timed region), on a fixed token
+corpus (complexity, rotation, scale and colors come from each token's
+sampled parameters; depth and size come from the grid).
+
+Results are written as JSON. Given --baseline, each case's median is
+compared with the saved run and the script exits non-zero when any case is
+slower by more than --threshold.
+
+    python scripts/benchmark-renderers.py --output bench.json
+    python scripts/benchmark-renderers.py --baseline bench.json --threshold 0.10
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import PIL
+from PIL import Image, ImageDraw
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
+
+DEFAULT_DEPTHS = [3, 4, 5, 6, 7]
+DEFAULT_SIZES = [256, 512, 1024]
+# Spread over all seven eras
+DEFAULT_TOKENS = [1, 635, 1270, 1905, 2540, 3175, 3810, 4444]
+
+ADVANCED_PATTERNS = ["bilateral", "radial", "spiral", "branching", "segmented", "crystalline"]
+SIMPLE_PATTERNS = ["bilateral", "spiral", "segmented", "radial"]
+ORGANISM_TYPES = ["butterfly", "jellyfish", "octopus", "seahorse", "coral", "fish"]
+
+
+def load_script(name: str):
+    """Import one of the hyphen-named generator scripts as a module"""
+    module_name = name.replace("-", "_")
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SCRIPTS_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def time_case(setup: Callable[[], Any], run: Callable[[Any], Any], repeat: int, warmup: int = 1) -> List[float]:
+    """Run setup (untimed) then run (timed) repeat times; returns seconds per run"""
+    for _ in range(warmup):
+        run(setup())
+
+    timings = []
+    for _ in range(repeat):
+        state = setup()
+        started = time.perf_counter()
+        run(state)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def advanced_cases(depths: List[int], sizes: List[int], tokens: List[int]):
+    """Cases for AdvancedFractalGenerator.draw_* (geometry + ImageDraw rasterization)"""
+    module = load_script("generate-4444-organisms")
+
+    for size in sizes:
+        generator = module.AdvancedFractalGenerator(width=size, height=size)
+        corpus = []
+        for token_id in tokens:
+            params = generator.sample_parameters(token_id)
+            era_colors = module.GEOLOGIC_ERAS[params["era_name"]]["colors"]
+            corpus.append((params, [generator.hex_to_rgb(color) for color in era_colors]))
+
+        for pattern in ADVANCED_PATTERNS:
+            method = getattr(generator, f"draw_{pattern}_fractal")
+            for depth in depths:
+                def run(draws, method=method, depth=depth):
+                    for draw, (params, colors) in zip(draws, corpus):
+                        method(draw, colors, depth, params["complexity"], params["rotation_factor"],
+                               params["scale_factor"], params["organism_name"])
+
+                def setup(size=size):
+                    return [ImageDraw.Draw(Image.new('RGBA', (size, size), (0, 0, 0, 0))) for _ in corpus]
+
+                yield f"advanced.draw_{pattern}_fractal/d{depth}/{size}", setup, run
+
+
+def simple_cases(depths: List[int], sizes: List[int], tokens: List[int]):
+    """Cases for UltraOptimizedFractalGenerator.draw_simple_*"""
+    module = load_script("run-optimization")
+
+    for size in sizes:
+        generator = module.UltraOptimizedFractalGenerator(width=size, height=size)
+        corpus = []
+        for token_id in tokens:
+            params = generator.sample_parameters(token_id)
+            era_colors = module.GEOLOGIC_ERAS[params["era_name"]]["colors"]
+            palette = generator.create_optimized_palette([generator.hex_to_rgb(c) for c in era_colors], 16)
+            corpus.append((params, palette))
+
+        for pattern in SIMPLE_PATTERNS:
+            method = getattr(generator, f"draw_simple_{pattern}")
+            for depth in depths:
+                def run(draws, method=method, depth=depth):
+                    for draw, (params, colors) in zip(draws, corpus):
+                        method(draw, colors, depth, params["complexity"], params["rotation_factor"],
+                               params["scale_factor"])
+
+                def setup(size=size):
+                    return [ImageDraw.Draw(Image.new('RGBA', (size, size), (0, 0, 0, 0))) for _ in corpus]
+
+                yield f"simple.draw_simple_{pattern}/d{depth}/{size}", setup, run
+
+
+def organism_cases(depths: List[int], sizes: List[int], tokens: List[int]):
+    """Cases for generate-fractal.create_fractal_organism, complexity taken from the corpus"""
+    module = load_script("generate-fractal")
+    sampler = load_script("generate-4444-organisms").AdvancedFractalGenerator()
+    complexities = [sampler.sample_parameters(token_id)["complexity"] for token_id in tokens]
+
+    for size in sizes:
+        for organism in ORGANISM_TYPES:
+            for depth in depths:
+                def run(_, organism=organism, depth=depth, size=size):
+                    for complexity in complexities:
+                        module.create_fractal_organism(organism, width=size, height=size,
+                                                       depth=depth, complexity=complexity)
+
+                yield f"organism.{organism}/d{depth}/{size}", lambda: None, run
+
+
+def raster_cases(depths: List[int], sizes: List[int], tokens: List[int]):
+    """Cases rasterizing prebuilt AdvancedFractalGenerator primitive buffers with each backend
+
+    The JIT cases only run with Numba installed (without it rasterize_jit is
+    the NumPy backend); the warmup run absorbs compilation.
+    """
+    import fractal_geometry
+    import raster_jit
+    import scanline
+
+    module = load_script("generate-4444-organisms")
+
+    for size in sizes:
+        generator = module.AdvancedFractalGenerator(width=size, height=size)
+        corpus = []
+        for token_id in tokens:
+            params = generator.sample_parameters(token_id)
+            era_colors = module.GEOLOGIC_ERAS[params["era_name"]]["colors"]
+            corpus.append((params, [generator.hex_to_rgb(color) for color in era_colors]))
+
+        for pattern in ADVANCED_PATTERNS:
+            method = getattr(generator, f"draw_{pattern}_fractal")
+            for depth in depths:
+                # draw=None only builds the geometry
+                buffers = [method(None, colors, depth, params["complexity"], params["rotation_factor"],
+                                  params["scale_factor"], params["organism_name"]) for params, colors in corpus]
+                for buffer in buffers:
+                    buffer.finalize()
+
+                def run_imagedraw(draws, buffers=buffers):
+                    for draw, buffer in zip(draws, buffers):
+                        fractal_geometry.rasterize_imagedraw(draw, buffer)
+
+                def run_numpy(canvas, buffers=buffers):
+                    for buffer in buffers:
+                        scanline.rasterize_scanline(canvas, buffer)
+
+                def run_jit(canvas, buffers=buffers):
+                    for buffer in buffers:
+                        raster_jit.rasterize_jit(canvas, buffer)
+
+                def setup_draws(size=size):
+                    return [ImageDraw.Draw(Image.new('RGBA', (size, size), (0, 0, 0, 0))) for _ in buffers]
+
+                def setup_canvas(size=size):
+                    return Image.new('RGBA', (size, size), (0, 0, 0, 0))
+
+                yield f"raster.imagedraw.{pattern}/d{depth}/{size}", setup_draws, run_imagedraw
+                yield f"raster.numpy.{pattern}/d{depth}/{size}", setup_canvas, run_numpy
+                if raster_jit.JIT_AVAILABLE:
+                    yield f"raster.jit.{pattern}/d{depth}/{size}", setup_canvas, run_jit
+
+
+SUITES = {
+    "advanced": advanced_cases,
+    "simple": simple_cases,
+    "organism": organism_cases,
+    "raster": raster_cases,
+}
+
+
+def run_benchmarks(suites: List[str], depths: List[int], sizes: List[int], tokens: List[int],
+                   repeat: int, name_filter: str = None, warmup: int = 1) -> Dict[str, Any]:
+    """Run the selected suites; returns the JSON-serializable report"""
+    results = {}
+    for suite in suites:
+        for name, setup, run in SUITES[suite](depths, sizes, tokens):
+            if name_filter and name_filter not in name:
+                continue
+            try:
+                timings = time_case(setup, run, repeat, warmup)
+            except Exception as e:
+                # Some renderers reject parts of the grid (e.g. negative segment sizes at high depth)
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+                print(f"  {name:<45} {'error':>10}    {results[name]['error']}")
+                continue
+            results[name] = {
+                "median_ms": round(statistics.median(timings) * 1000, 3),
+                "min_ms": round(min(timings) * 1000, 3),
+                "per_token_ms": round(statistics.median(timings) * 1000 / len(tokens), 3),
+                "runs": repeat,
+            }
+            print(f"  {name:<45} {results[name]['median_ms']:>10.2f} ms")
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {"suites": suites, "depths": depths, "sizes": sizes, "tokens": tokens,
+                   "repeat": repeat, "warmup": warmup},
+        "results": results,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float,
+            min_delta_ms: float = 0.5) -> List[Dict[str, Any]]:
+    """Cases slower than baseline by more than threshold (as a fraction)
+
+    Slowdowns under min_delta_ms are treated as timer noise.
+    """
+    regressions = []
+    print(f"\n{'case':<45} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None or not previous.get("median_ms"):
+            continue
+        if "error" in current:
+            # Worked in the baseline, fails now
+            print(f"{name:<45} {previous['median_ms']:>10.2f} {'error':>10}           REGRESSION")
+            regressions.append({"case": name, "baseline_ms": previous["median_ms"], "error": current["error"]})
+            continue
+        change = current["median_ms"] / previous["median_ms"] - 1
+        regressed = change > threshold and current["median_ms"] - previous["median_ms"] >= min_delta_ms
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<45} {previous['median_ms']:>10.2f} {current['median_ms']:>10.2f} {change:>+8.1%}{flag}")
+        if regressed:
+            regressions.append({"case": name, "baseline_ms": previous["median_ms"],
+                                "current_ms": current["median_ms"], "change": round(change, 4)})
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the fractal pattern renderers")
+    parser.add_argument("--suite", action="append", choices=sorted(SUITES),
+                        help="suite to run, repeatable (default: all)")
+    parser.add_argument("--depths", type=int, nargs="+", default=DEFAULT_DEPTHS)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--tokens", type=int, nargs="+", default=DEFAULT_TOKENS,
+                        help="token corpus supplying complexity/rotation/scale/colors")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case; the median is reported")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per case before timing")
+    parser.add_argument("--filter", default=None, help="only run cases whose name contains this text")
+    parser.add_argument("--output", default="benchmark-results.json", help="where to write this run's results")
+    parser.add_argument("--baseline", default=None, help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed slowdown vs baseline as a fraction (default: 0.10)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="ignore slowdowns smaller than this many milliseconds (default: 0.5)")
+    args = parser.parse_args()
+
+    suites = args.suite or list(SUITES)
+    print(f"Benchmarking {', '.join(suites)} on {len(args.tokens)} tokens, "
+          f"depths {args.depths}, sizes {args.sizes}, {args.repeat} runs each")
+    report = run_benchmarks(suites, args.depths, args.sizes, args.tokens, args.repeat, args.filter, args.warmup)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        report["comparison"] = {"baseline": args.baseline, "threshold": args.threshold,
+                                "min_delta_ms": args.min_delta_ms, "regressions": regressions}
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+        sys.exit(1)
@@ -0,0 +1,115 @@
+"""
+Per-process pool of reusable canvases and scratch arrays
+
+Every token used to allocate the same large buffers again: an RGBA canvas
+to draw on, a transparent canvas to paste the effects crop back onto, a
+white RGB canvas to flatten onto before encoding and the rasterizer's float
+scratch. Images of one mode/size (and arrays of one shape/dtype) are
+interchangeable, so they are handed back to the pool once the token no
+longer needs them and the next token reuses them after a fill.
+
+Pillow's own block allocator can also keep freed image blocks for reuse
+(its cache is off by default); reuse_pillow_blocks() turns that on for the
+intermediates the pool cannot own, like filter and convert results.
+
+Each process has its own pool (pool workers included). The pool is
+thread-safe, as encode threads release canvases while the next token
+renders. Only a few idle buffers are kept per key, which bounds the
+memory it holds.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from instrumentation import tracer
+
+# Idle buffers kept per (mode, size) or (shape, dtype)
+MAX_IDLE = 2
+
+# Freed Pillow blocks kept for reuse by reuse_pillow_blocks()
+PILLOW_BLOCKS = 32
+
+
+class CanvasPool:
+    """Hands out cleared images and arrays and takes them back after use"""
+
+    def __init__(self, max_idle: int = MAX_IDLE):
+        self.max_idle = max_idle
+        self._idle: Dict[Tuple, List] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.allocated = 0
+        self.reused = 0
+
+    def _take(self, key: Tuple):
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                tracer.count("pool.reused")
+                return idle.pop()
+            self.allocated += 1
+        tracer.count("pool.allocated")
+        return None
+
+    def _give(self, key: Tuple, item):
+        with self._lock:
+            idle = self._idle[key]
+            if len(idle) >= self.max_idle:
+                tracer.count("pool.dropped")
+                return
+            idle.append(item)
+        tracer.count("pool.released")
+
+    def acquire(self, mode: str, size: Tuple[int, int], fill=0) -> Image.Image:
+        """An image of mode and size filled with fill
+
+        fill=None skips clearing, for callers that overwrite every pixel.
+        """
+        img = self._take(("image", mode, tuple(size)))
+        if img is None:
+            return Image.new(mode, size, 0 if fill is None else fill)
+        if fill is not None:
+            img.paste(fill, (0, 0) + img.size)
+        return img
+
+    def acquire_array(self, shape: Tuple[int, ...], dtype, clear: bool = True) -> np.ndarray:
+        """A zeroed C-contiguous array
+
+        clear=False hands a reused array out as it was released, for callers
+        that return it zeroed (or do not need zeros).
+        """
+        dtype = np.dtype(dtype)
+        array = self._take(("array", tuple(shape), dtype.str))
+        if array is None:
+            return np.zeros(shape, dtype=dtype)
+        if clear:
+            array.fill(0)
+        return array
+
+    def release(self, item):
+        """Return an image or array; the caller must not use it afterwards"""
+        if item is None:
+            return
+        if isinstance(item, np.ndarray):
+            self._give(("array", item.shape, item.dtype.str), item)
+        else:
+            self._give(("image", item.mode, item.size), item)
+
+    def clear(self):
+        """Drop every idle buffer"""
+        with self._lock:
+            self._idle.clear()
+
+
+def reuse_pillow_blocks(blocks: int = PILLOW_BLOCKS):
+    """Let Pillow keep up to blocks freed image blocks for new images"""
+    if Image.core.get_blocks_max() < blocks:
+        Image.core.set_blocks_max(blocks)
+
+
+# Shared by every generator in the process
+canvas_pool = CanvasPool()
@@ -0,0 +1,121 @@
+"""
+Content-addressed image store
+
+Tokens whose encoded images are byte-identical share one file: images are
+stored under the SHA-256 of their bytes (generated_nfts/content/ab/abcd....png)
+and written only the first time that key is seen, so disk and upload
+volume scale with the number of distinct images. Each token points at its
+content key.
+
+The index (content_index.json) maps tokens to keys and records every key
+used by more than one token as a collision. Collisions are usually a
+duplicate-art bug, so validate-uniqueness.py reports them.
+"""
+
+import json
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from encoders import write_atomic
+from instrumentation import tracer
+from run_manifest import bytes_sha256
+
+INDEX_VERSION = 1
+
+
+class ContentStore:
+    """Deduplicating image writer keyed by SHA-256; put() is thread-safe
+
+    With resume=True the existing index is loaded, so tokens skipped by a
+    resumed run keep their entries.
+    """
+
+    def __init__(self, root: str = "generated_nfts/content",
+                 index_path: str = "generated_nfts/content_index.json", resume: bool = False):
+        self.root = root
+        self.index_path = index_path
+        self.token_keys: Dict[int, str] = {}
+        self.object_sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(root, exist_ok=True)
+        if resume and os.path.exists(index_path):
+            with open(index_path, "r") as f:
+                index = json.load(f)
+            self.token_keys = {int(token_id): key for token_id, key in index["tokens"].items()}
+            self.object_sizes = dict(index["objects"])
+
+    def path_for(self, key: str, extension: str) -> str:
+        """File path of a content key"""
+        return os.path.join(self.root, key[:2], f"{key}.{extension}")
+
+    def put(self, data: bytes, extension: str) -> Tuple[str, str]:
+        """Store encoded bytes unless identical bytes are already stored; returns (key, path)"""
+        key = bytes_sha256(data)
+        path = self.path_for(key, extension)
+        with self._lock:
+            if key in self.object_sizes and os.path.exists(path):
+                tracer.count("store.deduplicated")
+                return key, path
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(path, data)
+            self.object_sizes[key] = len(data)
+        tracer.count("store.written")
+        return key, path
+
+    def record(self, token_id: int, key: str, size_bytes: int):
+        """Point a token at a stored content key"""
+        with self._lock:
+            self.token_keys[token_id] = key
+            self.object_sizes.setdefault(key, size_bytes)
+
+    def collisions(self) -> Dict[str, List[int]]:
+        """Content keys shared by more than one token, with the tokens sharing them"""
+        tokens = defaultdict(list)
+        with self._lock:
+            for token_id, key in sorted(self.token_keys.items()):
+                tokens[key].append(token_id)
+        return {key: token_ids for key, token_ids in tokens.items() if len(token_ids) > 1}
+
+    def summary(self) -> Dict[str, Any]:
+        """Token and object counts, dedupe ratio (tokens per stored image) and bytes saved"""
+        with self._lock:
+            tokens = len(self.token_keys)
+            objects = len(set(self.token_keys.values()))
+            stored_bytes = sum(self.object_sizes[key] for key in set(self.token_keys.values()))
+            token_bytes = sum(self.object_sizes[key] for key in self.token_keys.values())
+        collisions = self.collisions()
+        return {
+            "tokens": tokens,
+            "objects": objects,
+            "dedupeRatio": round(tokens / objects, 3) if objects else 1.0,
+            "storedBytes": stored_bytes,
+            "savedBytes": token_bytes - stored_bytes,
+            "collisions": len(collisions),
+            "collidingTokens": sum(len(token_ids) for token_ids in collisions.values()),
+        }
+
+    def close(self):
+        """Write the index"""
+        index = {
+            "version": INDEX_VERSION,
+            "summary": self.summary(),
+            "tokens": {str(token_id): key for token_id, key in sorted(self.token_keys.items())},
+            "objects": self.object_sizes,
+            "collisions": self.collisions(),
+        }
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+
+def load_collisions(index_path: str = "generated_nfts/content_index.json") -> Optional[Dict[str, List[int]]]:
+    """Collisions recorded in a content index, or None if there is no index"""
+    if not os.path.exists(index_path):
+        return None
+    with open(index_path, "r") as f:
+        return json.load(f)["collisions"]
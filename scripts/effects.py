@@ -0,0 +1,111 @@
+"""
+Fused post-processing for the collection generators
+
+ImageEnhance's Color, Contrast and Brightness are each a blend against a
+degenerate image, i.e. an affine map of every pixel's RGB. Chained, they are
+still one affine map, so fused_enhance() applies them as a single 3x4 color
+matrix in one pass over the pixels (plus one ImageStat pass for the luma
+mean that Contrast pivots on), instead of building a degenerate image and
+a blended copy per enhancer. Alpha is passed through untouched, as the
+enhancers do.
+
+The convolutions (blur, unsharp mask) are not pointwise and keep Pillow's
+separable implementations; they run once each on the same buffer.
+
+Sparse organisms only cover part of a transparent canvas, so within_content()
+runs the effects on the alpha bounding box (plus a margin wider than the
+filter kernels) and pastes the result back onto a transparent canvas from
+the canvas pool.
+"""
+
+from typing import Callable, Optional, Tuple
+
+from PIL import Image, ImageFilter, ImageStat
+
+from canvas_pool import canvas_pool
+from instrumentation import tracer
+
+# ITU-R 601-2 luma weights, as used by Image.convert("L")
+LUMA = (0.299, 0.587, 0.114)
+
+# The chained enhancers truncate after every blend while the color matrix
+# rounds once; this offset cancels the difference on average
+TRUNCATION_BIAS = -1.0
+
+# Filters shared by every token
+SOFTEN = ImageFilter.GaussianBlur(radius=0.5)
+SHARPEN = ImageFilter.UnsharpMask(radius=0.8, percent=110, threshold=2)
+
+# Transparent border kept around the content box; covers the combined
+# support of SOFTEN and SHARPEN so edge pixels see the same zeros they would
+# on the full canvas
+CONTENT_MARGIN = 8
+
+
+def enhance_matrix(color: float, contrast: float, brightness: float, luma_mean: int) -> Tuple[float, ...]:
+    """Color matrix equal to Color(color) -> Contrast(contrast) -> Brightness(brightness)
+
+    Color blends each pixel with its own luma, Contrast with the image's
+    mean luma and Brightness with black.
+    """
+    matrix = []
+    offset = brightness * ((1 - contrast) * luma_mean + TRUNCATION_BIAS)
+    for row in range(3):
+        for column in range(3):
+            weight = (1 - color) * LUMA[column] + (color if row == column else 0.0)
+            matrix.append(brightness * contrast * weight)
+        matrix.append(offset)
+    return tuple(matrix)
+
+
+def fused_enhance(img: Image.Image, color: float = 1.0, contrast: float = 1.0,
+                  brightness: float = 1.0, canvas_pixels: Optional[int] = None) -> Image.Image:
+    """Apply color, contrast and brightness enhancement in one pass
+
+    Matches the ImageEnhance chain within a few levels per channel. Color
+    preserves luma, so the contrast pivot can be taken from the input.
+    For a crop of a canvas that is transparent black elsewhere, pass the
+    canvas size as canvas_pixels so the pivot is the whole canvas's mean.
+    """
+    means = ImageStat.Stat(img).mean
+    luma_sum = sum(weight * mean for weight, mean in zip(LUMA, means)) * img.width * img.height
+    luma_mean = int(luma_sum / (canvas_pixels or img.width * img.height) + 0.5)
+
+    rgb = img if img.mode == "RGB" else img.convert("RGB")
+    result = rgb.convert("RGB", enhance_matrix(color, contrast, brightness, luma_mean))
+    if "A" in img.getbands():
+        result.putalpha(img.getchannel("A"))
+    return result
+
+
+def content_box(img: Image.Image, margin: int = CONTENT_MARGIN) -> Optional[Tuple[int, int, int, int]]:
+    """Alpha bounding box grown by margin and clipped to the canvas; None if fully transparent"""
+    box = img.getchannel("A").getbbox()
+    if box is None:
+        return None
+    left, top, right, bottom = box
+    return (max(0, left - margin), max(0, top - margin),
+            min(img.width, right + margin), min(img.height, bottom + margin))
+
+
+def within_content(img: Image.Image, process: Callable[[Image.Image], Image.Image],
+                   margin: int = CONTENT_MARGIN) -> Tuple[Image.Image, int]:
+    """Run process on the content box of an RGBA canvas only
+
+    process must map transparent black to transparent black (blurs,
+    enhancers pivoting on a canvas-wide mean, sharpening). Returns the full
+    canvas and the number of pixels processed, which is also added to the
+    "pixels.effects" counter.
+    """
+    box = content_box(img, margin)
+    if box is None:
+        return img, 0
+
+    pixels = (box[2] - box[0]) * (box[3] - box[1])
+    tracer.count("pixels.effects", pixels)
+    if box == (0, 0, img.width, img.height):
+        return process(img), pixels
+
+    canvas = canvas_pool.acquire("RGBA", img.size, (0, 0, 0, 0))
+    canvas.paste(process(img.crop(box)), box[:2])
+    return canvas, pixels
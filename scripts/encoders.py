@@ -0,0 +1,241 @@
+"""
+In-memory, size-targeted image encoding
+
+Candidates are encoded into memory only. For lossy formats the preferred
+quality is tried first and, if it misses the byte target, the highest
+quality that fits is found by binary search. The winning bytes are kept so
+callers write them to disk exactly once and know the exact size without
+stat-ing the file.
+"""
+
+import io
+import os
+from typing import Any, Dict, List, Optional
+
+from PIL import Image
+
+from instrumentation import tracer
+
+FORMATS = {
+    "WebP": {"extension": "webp", "mime_type": "image/webp"},
+    "JPEG": {"extension": "jpg", "mime_type": "image/jpeg"},
+    "PNG": {"extension": "png", "mime_type": "image/png"},
+}
+
+
+def encode_image(img: Image.Image, image_format: str, quality: Optional[int] = None, **options: Any) -> bytes:
+    """Encode an image into bytes"""
+    buffer = io.BytesIO()
+    if quality is not None:
+        options["quality"] = quality
+    with tracer.span("encode", image_format):
+        img.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def encoded_result(data: bytes, image_format: str, quality: Optional[int] = None,
+                   attempts: int = 1) -> Dict[str, Any]:
+    """Describe an encoded candidate"""
+    return {
+        "data": data,
+        "format": image_format,
+        "quality": quality,
+        "size_bytes": len(data),
+        "extension": FORMATS[image_format]["extension"],
+        "mime_type": FORMATS[image_format]["mime_type"],
+        "attempts": attempts,
+    }
+
+
+def search_quality(img: Image.Image, image_format: str, target_bytes: int, preferred_quality: int,
+                   min_quality: int, **options: Any) -> Dict[str, Any]:
+    """Find the highest quality in [min_quality, preferred_quality] that fits target_bytes
+
+    The preferred quality is tried first, so easy images cost one encode.
+    Returns a result with "fits" set, or the smallest candidate seen when
+    nothing fits.
+    """
+    data = encode_image(img, image_format, preferred_quality, **options)
+    attempts = 1
+    if len(data) <= target_bytes:
+        result = encoded_result(data, image_format, preferred_quality, attempts)
+        result["fits"] = True
+        return result
+
+    best = None
+    smallest = (data, preferred_quality)
+    low, high = min_quality, preferred_quality - 1
+    while low <= high:
+        quality = (low + high) // 2
+        data = encode_image(img, image_format, quality, **options)
+        attempts += 1
+
+        if len(data) <= target_bytes:
+            best = (data, quality)
+            low = quality + 1
+        else:
+            if len(data) < len(smallest[0]):
+                smallest = (data, quality)
+            high = quality - 1
+
+    data, quality = best or smallest
+    result = encoded_result(data, image_format, quality, attempts)
+    result["fits"] = best is not None
+    return result
+
+
+def bracket_quality(img: Image.Image, image_format: str, target_bytes: int, guess: int,
+                    min_quality: int, max_quality: int, **options: Any) -> Dict[str, Any]:
+    """Highest quality in [min_quality, max_quality] that fits, searched outward from a guess
+
+    Gallops up (or down) from guess with doubling steps until the fit
+    boundary is bracketed, then bisects. For size monotone in quality this
+    finds the same quality as search_quality, in two encodes when the guess
+    is exact.
+    """
+    guess = max(min_quality, min(max_quality, guess))
+    attempts = 0
+    fits_at = {}
+
+    def probe(quality: int) -> bool:
+        nonlocal attempts
+        data = encode_image(img, image_format, quality, **options)
+        attempts += 1
+        fits_at[quality] = data
+        return len(data) <= target_bytes
+
+    step = 1
+    if probe(guess):
+        low, high = guess, max_quality + 1  # low fits, high fails (or is past the range)
+        while low < max_quality:
+            quality = min(low + step, max_quality)
+            if probe(quality):
+                low = quality
+                step *= 2
+            else:
+                high = quality
+                break
+    else:
+        low, high = min_quality - 1, guess  # low fits (or is below the range), high fails
+        while high > min_quality:
+            quality = max(high - step, min_quality)
+            if probe(quality):
+                low = quality
+                break
+            high = quality
+            step *= 2
+
+    while high - low > 1:
+        quality = (low + high) // 2
+        if probe(quality):
+            low = quality
+        else:
+            high = quality
+
+    if low >= min_quality:
+        result = encoded_result(fits_at[low], image_format, low, attempts)
+        result["fits"] = True
+    else:
+        result = encoded_result(fits_at[min_quality], image_format, min_quality, attempts)
+        result["fits"] = False
+    return result
+
+
+def encode_with_hint(img: Image.Image, target_bytes: int, strategies: List[Dict[str, Any]],
+                     strategy_index: Optional[int], quality: Optional[int]) -> Dict[str, Any]:
+    """Try a predicted strategy/quality directly, verifying it matches the ladder
+
+    strategy_index None predicts that no strategy fits. Every strategy before
+    the predicted one is checked with a single encode at its floor (lowest
+    quality). If any of them fits, or the predicted strategy does not, the
+    prediction missed and {"miss": True, "attempts": n} is returned so the
+    caller can fall back to encode_to_target.
+    """
+    attempts = 0
+    smallest = None
+
+    for index, strategy in enumerate(strategies):
+        image_format = strategy["format"]
+        source = img
+        if "prepare" in strategy:
+            with tracer.span("prepare", image_format):
+                source = strategy["prepare"](img)
+        options = dict(strategy.get("options", {}))
+        lossy = "preferred_quality" in strategy
+
+        if index == strategy_index:
+            if lossy:
+                result = bracket_quality(source, image_format, target_bytes,
+                                         quality if quality is not None else strategy["preferred_quality"],
+                                         strategy.get("min_quality", strategy["preferred_quality"]),
+                                         strategy["preferred_quality"], **options)
+            else:
+                result = encoded_result(encode_image(source, image_format, **options), image_format)
+                result["fits"] = result["size_bytes"] <= target_bytes
+            attempts += result["attempts"]
+            result["attempts"] = attempts
+            result["strategy"] = index
+            return result if result["fits"] else {"miss": True, "attempts": attempts}
+
+        # Earlier strategies must fail even at their lowest quality
+        floor = strategy.get("min_quality", strategy.get("preferred_quality")) if lossy else None
+        result = encoded_result(encode_image(source, image_format, floor, **options), image_format, floor)
+        attempts += 1
+        if result["size_bytes"] <= target_bytes:
+            return {"miss": True, "attempts": attempts}
+        if smallest is None or result["size_bytes"] < smallest["size_bytes"]:
+            smallest = result
+            smallest["strategy"] = index
+
+    # Predicted that nothing fits, and nothing did
+    smallest["fits"] = False
+    smallest["attempts"] = attempts
+    return smallest
+
+
+def encode_to_target(img: Image.Image, target_bytes: int, strategies: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Encode with the first strategy that fits target_bytes, else the smallest result
+
+    Each strategy has "format" and optional "prepare" (converts the image,
+    run only if the strategy is reached), "preferred_quality"/"min_quality"
+    for lossy formats and encoder "options".
+    The returned result's "attempts" counts every encode across strategies.
+    """
+    attempts = 0
+    smallest = None
+
+    for index, strategy in enumerate(strategies):
+        image_format = strategy["format"]
+        source = img
+        if "prepare" in strategy:
+            with tracer.span("prepare", image_format):
+                source = strategy["prepare"](img)
+        options = dict(strategy.get("options", {}))
+
+        if "preferred_quality" in strategy:
+            result = search_quality(source, image_format, target_bytes, strategy["preferred_quality"],
+                                    strategy.get("min_quality", strategy["preferred_quality"]), **options)
+        else:
+            result = encoded_result(encode_image(source, image_format, **options), image_format)
+            result["fits"] = result["size_bytes"] <= target_bytes
+
+        attempts += result["attempts"]
+        result["attempts"] = attempts
+        result["strategy"] = index
+
+        if result["fits"]:
+            return result
+        if smallest is None or result["size_bytes"] < smallest["size_bytes"]:
+            smallest = result
+
+    smallest["attempts"] = attempts
+    return smallest
+
+
+def write_atomic(path: str, data: bytes):
+    """Write bytes to path via a temporary file and rename"""
+    tmp_path = f"{path}.tmp"
+    with tracer.span("write", "image"):
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
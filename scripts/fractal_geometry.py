@@ -0,0 +1,522 @@
+"""
+Vectorized geometry engine for the recursive organism fractals
+
+Instead of recursing node by node in Python, each recursion level is held
+as arrays of instances (x, y, size, angle, ...). Child transforms are
+applied as batched array ops, and unit shape templates (wing, tentacle,
+spiral, segment, hexagon) are computed once per token and placed with an
+affine scale/rotate/translate. The result is a PrimitiveBuffer that a
+rasterizer consumes in the same paint order as the original recursion.
+
+Optional DetailLimits add level-of-detail culling: subtrees that lie
+entirely off the canvas or whose whole extent is below a pixel threshold
+are never expanded, and a per-token primitive budget drops the deepest
+levels once it would be exceeded.
+"""
+
+import math
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from instrumentation import tracer, traced
+
+POLYGON, LINE, ELLIPSE = 0, 1, 2
+
+# Primitives emitted per node are ordered by a sub-index below this bound
+_SUB_ORDER = 256
+
+# Extra pixels added to every subtree bound in the off-canvas test, for coordinate rounding
+_BOUND_PAD = 2.0
+
+State = Dict[str, np.ndarray]
+
+
+class DetailLimits:
+    """Level-of-detail culling settings for one canvas"""
+
+    def __init__(self, canvas_width: int, canvas_height: int, min_extent_px: float = 1.0,
+                 primitive_budget: int = 25000):
+        self.canvas_width = canvas_width
+        self.canvas_height = canvas_height
+        self.min_extent_px = min_extent_px
+        self.primitive_budget = primitive_budget
+
+
+def new_detail_stats() -> Dict[str, int]:
+    """Empty level-of-detail counters"""
+    return {
+        "primitivesDrawn": 0,
+        "culledOffCanvas": 0,
+        "culledSubpixel": 0,
+        "culledByBudget": 0,
+        "effectiveDepth": 0,
+    }
+
+
+class PrimitiveBuffer:
+    """Array-backed list of filled polygons, thick lines and ellipses in paint order"""
+
+    def __init__(self):
+        self._batches = []
+        self._finalized = None
+        # Culling counters, filled in by expand_levels
+        self.stats = new_detail_stats()
+
+    def _add(self, kind: int, keys: np.ndarray, points: np.ndarray, colors: np.ndarray, widths=None):
+        count = len(keys)
+        if count == 0:
+            return
+        if widths is None:
+            widths = np.ones(count, dtype=np.int32)
+        self._batches.append((
+            np.full(count, kind, dtype=np.uint8),
+            np.asarray(keys, dtype=np.int64),
+            np.asarray(points, dtype=np.float64).reshape(count, -1, 2),
+            np.broadcast_to(np.asarray(colors, dtype=np.uint8), (count, 4)),
+            np.broadcast_to(np.asarray(widths, dtype=np.int32), (count,)),
+        ))
+        self._finalized = None
+
+    def add_polygons(self, keys: np.ndarray, points: np.ndarray, colors):
+        """Add N filled polygons; points is (N, K, 2)"""
+        self._add(POLYGON, keys, points, colors)
+
+    def add_lines(self, keys: np.ndarray, points: np.ndarray, colors, widths):
+        """Add N thick line segments; points is (N, 2, 2)"""
+        self._add(LINE, keys, points, colors, widths)
+
+    def add_ellipses(self, keys: np.ndarray, boxes: np.ndarray, colors):
+        """Add N filled ellipses; boxes is (N, 4) as x0, y0, x1, y1"""
+        self._add(ELLIPSE, keys, boxes, colors)
+
+    def __len__(self) -> int:
+        return sum(len(batch[1]) for batch in self._batches)
+
+    def finalize(self) -> Dict[str, np.ndarray]:
+        """Merge all batches into flat arrays sorted by paint order
+
+        Returns kinds, paint-order keys (the emitting instance's order times
+        _SUB_ORDER plus a sub-index), colors (N, 4), widths, coords (P, 2) and
+        per-primitive starts/counts into coords.
+        """
+        if self._finalized is not None:
+            return self._finalized
+
+        if not self._batches:
+            empty = np.zeros(0, dtype=np.int64)
+            self._finalized = {
+                "kinds": empty.astype(np.uint8), "keys": empty, "colors": np.zeros((0, 4), dtype=np.uint8),
+                "widths": empty.astype(np.int32), "coords": np.zeros((0, 2)),
+                "starts": empty, "counts": empty,
+            }
+            return self._finalized
+
+        kinds = np.concatenate([b[0] for b in self._batches])
+        keys = np.concatenate([b[1] for b in self._batches])
+        colors = np.concatenate([b[3] for b in self._batches])
+        widths = np.concatenate([b[4] for b in self._batches])
+        counts = np.concatenate([np.full(len(b[1]), b[2].shape[1], dtype=np.int64) for b in self._batches])
+        coords = np.concatenate([b[2].reshape(-1, 2) for b in self._batches])
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        order = np.argsort(keys, kind="stable")
+        self._finalized = {
+            "kinds": kinds[order],
+            "keys": keys[order],
+            "colors": colors[order],
+            "widths": widths[order],
+            "coords": coords,
+            "starts": starts[order],
+            "counts": counts[order],
+        }
+        return self._finalized
+
+
+def rasterize_imagedraw(draw, buffer: PrimitiveBuffer):
+    """Paint a primitive buffer with PIL ImageDraw, in buffer order"""
+    data = buffer.finalize()
+    coords = data["coords"].ravel().tolist()
+    colors = [tuple(color) for color in data["colors"].tolist()]
+
+    with tracer.span("rasterize", "imagedraw"):
+        for kind, start, count, color, width in zip(data["kinds"].tolist(), data["starts"].tolist(),
+                                                    data["counts"].tolist(), colors, data["widths"].tolist()):
+            xy = coords[2 * start:2 * (start + count)]
+            if kind == POLYGON:
+                draw.polygon(xy, fill=color)
+            elif kind == LINE:
+                draw.line(xy, fill=color, width=width)
+            else:
+                draw.ellipse(xy, fill=color)
+
+
+def place_template(template: np.ndarray, x: np.ndarray, y: np.ndarray,
+                   scale_x: np.ndarray, scale_y: np.ndarray, angle: np.ndarray) -> np.ndarray:
+    """Scale, rotate and translate a (K, 2) unit template to (N, K, 2) instances"""
+    cos_a = np.cos(angle)[:, None]
+    sin_a = np.sin(angle)[:, None]
+    u = template[None, :, 0] * scale_x[:, None]
+    v = template[None, :, 1] * scale_y[:, None]
+    return np.stack([x[:, None] + u * cos_a - v * sin_a,
+                     y[:, None] + u * sin_a + v * cos_a], axis=-1)
+
+
+def expand_levels(roots: State, depth: int, min_size: float, size_factor: float, branch_factor: int,
+                  spawn: Callable[[State], List[State]], reach: Callable[[State, int], np.ndarray] = None,
+                  primitives_per_node: int = 1, limits: DetailLimits = None,
+                  stats: Dict[str, int] = None) -> Iterator[Tuple[int, State]]:
+    """Breadth-first expansion of a recursive fractal, one level at a time
+
+    Yields (level, state) from level=depth down to 1. Every child is
+    size_factor times the size of its parent. Instances whose size is below
+    min_size are dropped together with their subtree, like the early return
+    in the recursive renderers. state["order"] is the depth-first
+    preorder key of every instance, so sorting by it reproduces the paint
+    order of the recursion.
+
+    With limits and reach(state, level) (radius bounding each instance's
+    whole remaining subtree),
+    subtrees off the canvas or smaller than limits.min_extent_px are culled,
+    and expansion stops before a level that would exceed the primitive
+    budget. Counters are accumulated into stats; the culled counters count
+    every primitive of the dropped subtrees that min_size would have kept.
+    """
+    radix = branch_factor + 1
+    state = dict(roots)
+    state["key"] = np.arange(1, len(roots["size"]) + 1, dtype=np.int64)
+    if stats is None:
+        stats = new_detail_stats()
+
+    for level in range(depth, 0, -1):
+        keep = state["size"] >= min_size
+
+        if limits is not None and reach is not None:
+            radius = reach(state, level)
+            # Only the canvas test is padded; a padded extent is never under 4px
+            padded = radius + _BOUND_PAD
+            off_canvas = ((state["x"] + padded < 0) | (state["x"] - padded > limits.canvas_width) |
+                          (state["y"] + padded < 0) | (state["y"] - padded > limits.canvas_height))
+            subpixel = ~off_canvas & (2 * radius < limits.min_extent_px)
+            nodes = _subtree_nodes(state["size"], level, min_size, size_factor, branch_factor)
+            stats["culledOffCanvas"] += int(nodes[keep & off_canvas].sum()) * primitives_per_node
+            stats["culledSubpixel"] += int(nodes[keep & subpixel].sum()) * primitives_per_node
+            keep &= ~(off_canvas | subpixel)
+
+        state = {name: values[keep] for name, values in state.items()}
+        if len(state["key"]) == 0:
+            return
+
+        cost = len(state["key"]) * primitives_per_node
+        if limits is not None and stats["primitivesDrawn"] + cost > limits.primitive_budget:
+            # Graceful depth reduction: drop this level and everything below it
+            nodes = _subtree_nodes(state["size"], level, min_size, size_factor, branch_factor)
+            stats["culledByBudget"] += int(nodes.sum()) * primitives_per_node
+            return
+
+        stats["primitivesDrawn"] += cost
+        stats["effectiveDepth"] += 1
+        state["order"] = state["key"] * radix ** (level - 1)
+        yield level, state
+
+        if level == 1:
+            return
+
+        children = spawn(state)
+        next_state = {name: np.concatenate([child[name] for child in children]) for name in children[0]}
+        next_state["key"] = np.concatenate([state["key"] * radix + (index + 1)
+                                            for index in range(len(children))])
+        state = next_state
+
+
+def _level_color(colors: List[Tuple[int, int, int]], level: int, alpha: int) -> Tuple[int, int, int, int]:
+    return colors[level % len(colors)] + (alpha,)
+
+
+def _roots(count: int, x: float, y: float, size: float, angles, **extra) -> State:
+    state = {
+        "x": np.full(count, float(x)),
+        "y": np.full(count, float(y)),
+        "size": np.full(count, float(size)),
+        "angle": np.asarray(angles, dtype=np.float64).reshape(count),
+    }
+    for name, value in extra.items():
+        state[name] = np.broadcast_to(np.asarray(value, dtype=np.float64), (count,)).copy()
+    return state
+
+
+def _max_norm(points) -> float:
+    return float(np.max(np.hypot(*np.asarray(points, dtype=np.float64).T)))
+
+
+def _levels_left(size: np.ndarray, level: int, min_size: float, shrink: float) -> np.ndarray:
+    """Levels (including this one) an instance's subtree can still draw"""
+    by_size = np.floor(np.log(size / min_size) / -math.log(shrink) + 1e-9) + 1
+    return np.clip(by_size, 1, level)
+
+
+def _subtree_nodes(size: np.ndarray, level: int, min_size: float, shrink: float,
+                   branch_factor: int) -> np.ndarray:
+    """Instances (including this one) in each subtree that min_size pruning leaves"""
+    levels = _levels_left(size, level, min_size, shrink)
+    if branch_factor == 1:
+        return levels.astype(np.int64)
+    return (branch_factor ** levels.astype(np.int64) - 1) // (branch_factor - 1)
+
+
+def subtree_reach(size: np.ndarray, level: int, min_size: float, size_factor: float,
+                  own: float, offset: float) -> np.ndarray:
+    """Radius around an instance that bounds it and every descendant still drawn
+
+    own is the shape radius and offset the largest child offset, both
+    relative to size; both shrink by size_factor per level.
+    """
+    levels = _levels_left(size, level, min_size, size_factor)
+    shapes = (1 - size_factor ** levels) / (1 - size_factor)
+    hops = (1 - size_factor ** (levels - 1)) / (1 - size_factor)
+    return size * (own * shapes + offset * hops)
+
+
+@traced("geometry")
+def bilateral_fractal(center_x: float, center_y: float, base_size: float, colors, depth: int,
+                      complexity: float, rotation: float, limits: DetailLimits = None) -> PrimitiveBuffer:
+    """Wing fractal mirrored on both sides (see draw_bilateral_fractal)"""
+    t = np.arange(8) / 7
+    wing = np.stack([0.8 * np.cos(t * math.pi) + 0.2 * np.cos(3 * t * math.pi),
+                     0.6 * np.sin(t * math.pi) * (1 - t * 0.3)], axis=-1)
+    size_factor = 0.4 + complexity * 0.3
+    offsets = [(0.7, -0.3, 0.3), (0.5, 0.4, -0.2), (0.3, -0.6, 0.5)]
+
+    def spawn(s: State) -> List[State]:
+        return [{
+            "x": s["x"] + dx * s["side"] * s["size"],
+            "y": s["y"] + dy * s["size"],
+            "size": s["size"] * size_factor,
+            "angle": s["angle"] + d_angle,
+            "side": s["side"],
+        } for dx, dy, d_angle in offsets]
+
+    wing_reach = _max_norm(wing)
+    offset_reach = _max_norm([o[:2] for o in offsets])
+
+    buffer = PrimitiveBuffer()
+    roots = _roots(2, center_x, center_y, base_size, [rotation, rotation], side=[1, -1])
+    for level, s in expand_levels(roots, depth, 8, size_factor, len(offsets), spawn,
+                                  reach=lambda state, level: subtree_reach(state["size"], level, 8, size_factor,
+                                                                           wing_reach, offset_reach),
+                                  limits=limits, stats=buffer.stats):
+        color = _level_color(colors, level, int(255 * (level / depth) * 0.7))
+        points = place_template(wing, s["x"], s["y"], s["side"] * s["size"], s["size"], s["angle"])
+        buffer.add_polygons(s["order"] * _SUB_ORDER, points, color)
+    return buffer
+
+
+@traced("geometry")
+def radial_fractal(center_x: float, center_y: float, base_size: float, colors, depth: int,
+                   complexity: float, rotation: float, limits: DetailLimits = None) -> PrimitiveBuffer:
+    """Tentacle arms around the center (see draw_radial_fractal)"""
+    t = np.arange(12) / 11
+    spine_x = t * np.cos(t * complexity)
+    spine_y = t * np.sin(t * complexity)
+    half_width = 0.1 * (1 - t * 0.7)
+    upper = np.stack([spine_x, spine_y + half_width], axis=-1)
+    lower = np.stack([spine_x, spine_y - half_width], axis=-1)[::-1]
+    tentacle = np.concatenate([upper[:1], upper, lower])
+
+    size_factor = 0.3 + complexity * 0.2
+    stations = [i / 4 for i in range(2, 4)]
+
+    def spawn(s: State) -> List[State]:
+        return [{
+            "x": s["x"] + s["size"] * st * np.cos(s["angle"] + st * complexity * 0.5),
+            "y": s["y"] + s["size"] * st * np.sin(s["angle"] + st * complexity * 0.5),
+            "size": s["size"] * size_factor,
+            "angle": s["angle"] + (st - 0.5) * complexity,
+        } for st in stations]
+
+    num_arms = int(6 + complexity * 6)  # 6-12 arms
+    angles = [rotation + (i / num_arms) * 2 * math.pi for i in range(num_arms)]
+
+    tentacle_reach = _max_norm(tentacle)
+
+    buffer = PrimitiveBuffer()
+    roots = _roots(num_arms, center_x, center_y, base_size, angles)
+    for level, s in expand_levels(roots, depth, 5, size_factor, len(stations), spawn,
+                                  reach=lambda state, level: subtree_reach(state["size"], level, 5, size_factor,
+                                                                           tentacle_reach, max(stations)),
+                                  limits=limits, stats=buffer.stats):
+        color = _level_color(colors, level, int(255 * (level / depth) * 0.8))
+        points = place_template(tentacle, s["x"], s["y"], s["size"], s["size"], s["angle"])
+        buffer.add_polygons(s["order"] * _SUB_ORDER, points, color)
+    return buffer
+
+
+@traced("geometry")
+def spiral_fractal(center_x: float, center_y: float, base_size: float, colors, depth: int,
+                   complexity: float, rotation: float, limits: DetailLimits = None) -> PrimitiveBuffer:
+    """Nested spiral shells drawn as thick polylines (see draw_spiral_fractal)"""
+    turns = 2 + complexity * 2
+    segments = int(30 * turns)
+    t = np.arange(segments) / segments
+    theta = t * turns * 2 * math.pi
+    radius = 0.1 + t * 0.9
+    spiral = np.stack([radius * np.cos(theta), radius * np.sin(theta)], axis=-1)
+
+    size_factor = 0.35 + complexity * 0.25
+    offsets = [(0.6, 0, math.pi / 3), (-0.4, 0.3, -math.pi / 4), (0.2, -0.5, math.pi / 2)]
+
+    def spawn(s: State) -> List[State]:
+        return [{
+            "x": s["x"] + dx * s["size"],
+            "y": s["y"] + dy * s["size"],
+            "size": s["size"] * size_factor,
+            "angle": s["angle"] + d_angle,
+            "tightness": s["tightness"] * 0.8,
+        } for dx, dy, d_angle in offsets]
+
+    # Tightness only shrinks, so the untightened spiral (plus line width) bounds it
+    spiral_reach = _max_norm(spiral) + 0.05
+    offset_reach = _max_norm([o[:2] for o in offsets])
+
+    buffer = PrimitiveBuffer()
+    roots = _roots(1, center_x, center_y, base_size, [rotation], tightness=[1.0])
+    sub = np.arange(segments - 1)
+    for level, s in expand_levels(roots, depth, 8, size_factor, len(offsets), spawn,
+                                  reach=lambda state, level: subtree_reach(state["size"], level, 8, size_factor,
+                                                                           spiral_reach, offset_reach),
+                                  primitives_per_node=segments - 1,
+                                  limits=limits, stats=buffer.stats):
+        color = _level_color(colors, level, int(255 * (level / depth) * 0.9))
+        scale = s["size"] * s["tightness"]
+        points = place_template(spiral, s["x"], s["y"], scale, scale, s["angle"])
+        # Consecutive point pairs become individual line segments
+        pairs = np.stack([points[:, :-1], points[:, 1:]], axis=2)
+        keys = s["order"][:, None] * _SUB_ORDER + sub[None, :]
+        widths = np.maximum(1, (s["size"] * 0.05).astype(np.int32))
+        buffer.add_lines(keys.ravel(), pairs.reshape(-1, 2, 2), color,
+                         np.repeat(widths, segments - 1))
+    return buffer
+
+
+@traced("geometry")
+def branching_fractal(center_x: float, center_y: float, base_size: float, base_thickness: float,
+                      colors, depth: int, complexity: float, rotation: float,
+                      limits: DetailLimits = None) -> PrimitiveBuffer:
+    """Branches with nodes radiating from the center (see draw_branching_fractal)"""
+    size_factor = 0.6 + complexity * 0.2
+    spread = [-0.5 - complexity * 0.3, 0.5 + complexity * 0.3, -0.2, 0.2][:int(2 + complexity * 2)]
+
+    def spawn(s: State) -> List[State]:
+        fork_x = s["x"] + s["size"] * 0.7 * np.cos(s["angle"])
+        fork_y = s["y"] + s["size"] * 0.7 * np.sin(s["angle"])
+        return [{
+            "x": fork_x,
+            "y": fork_y,
+            "size": s["size"] * size_factor,
+            "angle": s["angle"] + d_angle,
+            "thickness": s["thickness"] * 0.7,
+        } for d_angle in spread]
+
+    main_branches = int(3 + complexity * 3)
+    angles = [rotation + (i / main_branches) * 2 * math.pi for i in range(main_branches)]
+
+    # Branch length and fork offset scale with size; line width and node by thickness
+    def reach(state: State, level: int) -> np.ndarray:
+        levels = _levels_left(state["size"], level, 10, size_factor)
+        return (subtree_reach(state["size"], level, 10, size_factor, 1.0, 0.7) +
+                state["thickness"] * (1 - 0.7 ** levels) / 0.3)
+
+    buffer = PrimitiveBuffer()
+    roots = _roots(main_branches, center_x, center_y, base_size, angles, thickness=base_thickness)
+    for level, s in expand_levels(roots, depth, 10, size_factor, max(len(spread), 1), spawn, reach=reach,
+                                  primitives_per_node=2, limits=limits, stats=buffer.stats):
+        color = _level_color(colors, level, int(255 * (level / depth) * 0.8))
+        end_x = s["x"] + s["size"] * np.cos(s["angle"])
+        end_y = s["y"] + s["size"] * np.sin(s["angle"])
+        lines = np.stack([s["x"], s["y"], end_x, end_y], axis=-1)
+        buffer.add_lines(s["order"] * _SUB_ORDER, lines, color,
+                         np.maximum(1, s["thickness"].astype(np.int32)))
+
+        node = s["thickness"] * 0.8
+        boxes = np.stack([s["x"] - node, s["y"] - node, s["x"] + node, s["y"] + node], axis=-1)
+        buffer.add_ellipses(s["order"] * _SUB_ORDER + 1, boxes, color)
+    return buffer
+
+
+@traced("geometry")
+def segmented_fractal(center_x: float, center_y: float, base_size: float, base_width: float,
+                      colors, depth: int, complexity: float, rotation: float,
+                      limits: DetailLimits = None) -> PrimitiveBuffer:
+    """Chained body segments (see draw_segmented_fractal)"""
+    t = np.arange(8) / 7
+    along = (t - 0.5) * 0.8
+    across = 1 - np.abs(t - 0.5) * 0.5
+    segment = np.concatenate([np.stack([along, across], axis=-1),
+                              np.stack([along, -across], axis=-1)[::-1]])
+
+    size_factor = 0.4 + complexity * 0.3
+    offsets = [(0.6, 0, 0), (-0.6, 0, math.pi), (0, 0.5, math.pi / 2),
+               (0, -0.5, -math.pi / 2)][:int(2 + complexity * 2)]
+
+    def spawn(s: State) -> List[State]:
+        return [{
+            "x": s["x"] + dx * s["size"],
+            "y": s["y"] + dy * s["size"],
+            "size": s["size"] * size_factor,
+            "angle": s["angle"] + d_angle,
+            "width": s["width"] * 0.7,
+        } for dx, dy, d_angle in offsets]
+
+    # Segment length and child offsets scale with size, segment width by 0.7 per level
+    def reach(state: State, level: int) -> np.ndarray:
+        levels = _levels_left(state["size"], level, 12, size_factor)
+        return (subtree_reach(state["size"], level, 12, size_factor, 0.4, 0.6) +
+                state["width"] * (1 - 0.7 ** levels) / 0.3)
+
+    buffer = PrimitiveBuffer()
+    roots = _roots(1, center_x, center_y, base_size, [rotation], width=base_width)
+    for level, s in expand_levels(roots, depth, 12, size_factor, max(len(offsets), 1), spawn, reach=reach,
+                                  limits=limits, stats=buffer.stats):
+        color = _level_color(colors, level, int(255 * (level / depth) * 0.8))
+        points = place_template(segment, s["x"], s["y"], s["size"], s["width"], s["angle"])
+        buffer.add_polygons(s["order"] * _SUB_ORDER, points, color)
+    return buffer
+
+
+@traced("geometry")
+def crystalline_fractal(center_x: float, center_y: float, base_size: float, colors, depth: int,
+                        complexity: float, rotation: float, limits: DetailLimits = None) -> PrimitiveBuffer:
+    """Hexagonal crystals with inner cores (see draw_crystalline_fractal)"""
+    sides = 6
+    corner_angles = np.arange(sides) / sides * 2 * math.pi
+    hexagon = np.stack([np.cos(corner_angles), np.sin(corner_angles)], axis=-1)
+    outer = hexagon * 0.5
+    inner = hexagon * 0.25
+
+    size_factor = 0.35 + complexity * 0.25
+
+    def spawn(s: State) -> List[State]:
+        children = []
+        for corner in corner_angles:
+            child_angle = s["angle"] + corner
+            children.append({
+                "x": s["x"] + s["size"] * 0.8 * np.cos(child_angle),
+                "y": s["y"] + s["size"] * 0.8 * np.sin(child_angle),
+                "size": s["size"] * size_factor,
+                "angle": child_angle + complexity,
+            })
+        return children
+
+    buffer = PrimitiveBuffer()
+    roots = _roots(1, center_x, center_y, base_size, [rotation])
+    for level, s in expand_levels(roots, depth, 8, size_factor, sides, spawn,
+                                  reach=lambda state, level: subtree_reach(state["size"], level, 8, size_factor,
+                                                                           0.5, 0.8),
+                                  primitives_per_node=2, limits=limits, stats=buffer.stats):
+        alpha = int(255 * (level / depth) * 0.9)
+        keys = s["order"] * _SUB_ORDER
+        buffer.add_polygons(keys, place_template(outer, s["x"], s["y"], s["size"], s["size"], s["angle"]),
+                            _level_color(colors, level, alpha))
+        buffer.add_polygons(keys + 1, place_template(inner, s["x"], s["y"], s["size"], s["size"], s["angle"]),
+                            colors[(level + 1) % len(colors)] + (alpha // 2,))
+    return buffer
@@ -1,11 +1,30 @@
-import numpy as np
-from PIL import Image, ImageDraw, ImageFilter, ImageEnhance
+from PIL import Image, ImageDraw
 import colorsys
 import math
 import json
 import os
+import argparse
+import multiprocessing
 from typing import Dict, List, Tuple, Any
 
+from seeding import COLLECTION_SEED, token_rng
+from run_manifest import RunManifest, bytes_sha256, params_hash
+import fractal_geometry
+from fractal_geometry import DetailLimits, PrimitiveBuffer
+from scanline import RASTERIZERS, rasterize_scanline
+from raster_jit import rasterize_jit
+from backgrounds import era_background
+from canvas_pool import canvas_pool, reuse_pillow_blocks
+from effects import SHARPEN, SOFTEN, fused_enhance, within_content
+from encoders import encode_to_target, write_atomic
+from metadata_sink import MetadataSink
+from pipeline import StagedPipeline, bounded_imap
+from instrumentation import tracer, traced
+from size_predictor import StrategyPredictor, image_features
+
+# Bump whenever rendering or encoding changes so --resume re-renders tokens
+RENDER_VERSION = 7
+
 # Geologic era data matching the TypeScript definitions
 GEOLOGIC_ERAS = {
     "precambrian": {
@@ -39,19 +58,32 @@ GEOLOGIC_ERAS = {
 }
 
 class AdvancedFractalGenerator:
-    def __init__(self, width=512, height=512):  # Reduced from 1024x1024 to 512x512 for smaller file sizes
+    def __init__(self, width=512, height=512, collection_seed=COLLECTION_SEED,
+                 min_extent_px=1.0, primitive_budget=25000, predict_encoding=True,
+                 rasterizer="imagedraw"):  # Reduced from 1024x1024 to 512x512 for smaller file sizes
+        if rasterizer not in RASTERIZERS:
+            raise ValueError(f"Unknown rasterizer {rasterizer!r}, expected one of {', '.join(RASTERIZERS)}")
         self.width = width
         self.height = height
         self.center_x = width // 2
         self.center_y = height // 2
+        self.collection_seed = collection_seed
+        # Subtrees off-canvas or under min_extent_px are culled; deep levels past the budget are dropped
+        self.detail_limits = DetailLimits(width, height, min_extent_px, primitive_budget)
+        # Learns which encoder strategy wins for similar tokens to skip most of the ladder
+        self.size_predictor = StrategyPredictor() if predict_encoding else None
+        # "imagedraw" paints primitives one by one (overwriting alpha); "numpy" blends the
+        # whole primitive buffer at once with premultiplied alpha (see scanline.py);
+        # "jit" does the same with a Numba-compiled kernel, falling back to "numpy"
+        self.rasterizer = rasterizer
         
     def hex_to_rgb(self, hex_color: str) -> Tuple[int, int, int]:
         """Convert hex color to RGB tuple"""
         hex_color = hex_color.lstrip('#')
         return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
     
-    def generate_organism_fractal(self, token_id: int) -> Dict[str, Any]:
-        """Generate a unique fractal organism based on token ID"""
+    def sample_parameters(self, token_id: int) -> Dict[str, Any]:
+        """Sample the deterministic generation parameters for a token"""
         # Determine era and organism based on token distribution
         era_names = list(GEOLOGIC_ERAS.keys())
         organisms_per_era = 4444 // len(era_names)
@@ -59,23 +91,61 @@ class AdvancedFractalGenerator:
         era_name = era_names[era_index]
         era_data = GEOLOGIC_ERAS[era_name]
         
-        # Use token_id as seed for deterministic generation
-        np.random.seed(token_id)
+        # Per-token RNG stream for deterministic, thread-safe generation
+        rng = token_rng(token_id, "params", self.collection_seed)
         
         # Select base organism
         organism_name = era_data["organisms"][token_id % len(era_data["organisms"])]
         
         # Generate unique parameters
-        fractal_depth = np.random.randint(4, 8)
-        complexity = 0.3 + np.random.random() * 0.7
-        color_variant = np.random.randint(0, len(era_data["colors"]))
-        rotation_factor = np.random.random() * 2 * math.pi
-        scale_factor = 0.8 + np.random.random() * 0.4
+        fractal_depth = int(rng.integers(4, 8))
+        complexity = 0.3 + rng.random() * 0.7
+        color_variant = int(rng.integers(0, len(era_data["colors"])))
+        rotation_factor = rng.random() * 2 * math.pi
+        scale_factor = 0.8 + rng.random() * 0.4
+        
+        return {
+            "era_name": era_name,
+            "organism_name": organism_name,
+            "fractal_depth": fractal_depth,
+            "complexity": complexity,
+            "color_variant": color_variant,
+            "rotation_factor": rotation_factor,
+            "scale_factor": scale_factor
+        }
+    
+    def params_hash(self, token_id: int) -> str:
+        """Hash of everything that determines a token's pixels"""
+        return params_hash({
+            "generator": "generate-4444-organisms",
+            "renderVersion": RENDER_VERSION,
+            # "numpy" and "jit" produce identical pixels
+            "rasterizer": "imagedraw" if self.rasterizer == "imagedraw" else "composite",
+            "tokenId": token_id,
+            "width": self.width,
+            "height": self.height,
+            "minExtentPx": self.detail_limits.min_extent_px,
+            "primitiveBudget": self.detail_limits.primitive_budget,
+            "collectionSeed": self.collection_seed,
+            "params": self.sample_parameters(token_id)
+        })
+    
+    def generate_organism_fractal(self, token_id: int) -> Dict[str, Any]:
+        """Generate a unique fractal organism based on token ID"""
+        with tracer.span("params"):
+            params = self.sample_parameters(token_id)
+        era_name = params["era_name"]
+        organism_name = params["organism_name"]
+        fractal_depth = params["fractal_depth"]
+        complexity = params["complexity"]
+        color_variant = params["color_variant"]
+        rotation_factor = params["rotation_factor"]
+        scale_factor = params["scale_factor"]
         
         # Create the fractal image
-        img = self.create_artistic_fractal(
+        img, render_stats = self.create_artistic_fractal(
             organism_name=organism_name,
-            era_colors=era_data["colors"],
+            era_colors=GEOLOGIC_ERAS[era_name]["colors"],
             depth=fractal_depth,
             complexity=complexity,
             color_variant=color_variant,
@@ -94,508 +164,425 @@ class AdvancedFractalGenerator:
             "complexity": round(complexity, 3),
             "colorVariant": color_variant,
             "rotationFactor": round(rotation_factor, 3),
-            "scaleFactor": round(scale_factor, 3)
+            "scaleFactor": round(scale_factor, 3),
+            "renderStats": render_stats
         }
         
         return {"image": img, "metadata": metadata}
     
     def create_artistic_fractal(self, organism_name: str, era_colors: List[str], 
                               depth: int, complexity: float, color_variant: int,
-                              rotation_factor: float, scale_factor: float, token_id: int) -> Image.Image:
-        """Create an artistic fractal with organism-specific patterns"""
+                              rotation_factor: float, scale_factor: float, token_id: int) -> Tuple[Image.Image, Dict[str, int]]:
+        """Create an artistic fractal with organism-specific patterns
         
-        # Create base image with transparency
-        img = Image.new('RGBA', (self.width, self.height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(img)
+        Returns the image and the level-of-detail counters of the pattern
+        (primitives drawn, culled off-canvas / subpixel / by budget).
+        """
         
         # Convert era colors to RGB
         rgb_colors = [self.hex_to_rgb(color) for color in era_colors]
         
-        # Create background gradient
-        self.create_background_gradient(draw, rgb_colors, color_variant)
+        # Start from the cached background gradient (transparent elsewhere) on a pooled canvas
+        with tracer.span("background"):
+            img = self.create_background_gradient(rgb_colors, color_variant,
+                                                  canvas_pool.acquire('RGBA', (self.width, self.height), None))
+        # The compositing rasterizers paint the returned primitive buffer afterwards
+        draw = ImageDraw.Draw(img) if self.rasterizer == "imagedraw" else None
         
         # Generate organism-specific fractal pattern
         if organism_name in ["butterfly", "pteranodon", "terror-bird"]:
-            self.draw_bilateral_fractal(draw, rgb_colors, depth, complexity, rotation_factor, scale_factor, "wings")
+            buffer = self.draw_bilateral_fractal(draw, rgb_colors, depth, complexity, rotation_factor, scale_factor, "wings")
         elif organism_name in ["jellyfish", "crinoid", "meganeura"]:
-            self.draw_radial_fractal(draw, rgb_colors, depth, complexity, rotation_factor, scale_factor, "tentacles")
+            buffer = self.draw_radial_fractal(draw, rgb_colors, depth, complexity, rotation_factor, scale_factor, "tentacles")
         elif organism_name in ["ammonite", "helicoprion", "cyanobacteria"]:
-            self.draw_spiral_fractal(draw, rgb_colors, depth, complexity, rotation_factor, scale_factor, "shell")
+            buffer = self.draw_spiral_fractal(draw, rgb_colors, depth, complexity, rotation_factor, scale_factor, "shell")
         elif organism_name in ["coral", "stromatolite", "lepidodendron", "archaeopteris"]:
-            self.draw_branching_fractal(draw, rgb_colors, depth, complexity, rotation_factor, scale_factor, "branches")
+            buffer = self.draw_branching_fractal(draw, rgb_colors, depth, complexity, rotation_factor, scale_factor, "branches")
         elif organism_name in ["trilobite", "dimetrodon", "mammoth", "tyrannosaurus"]:
-            self.draw_segmented_fractal(draw, rgb_colors, depth, complexity, rotation_factor, scale_factor, "segments")
+            buffer = self.draw_segmented_fractal(draw, rgb_colors, depth, complexity, rotation_factor, scale_factor, "segments")
         else:
             # Default crystalline pattern for microscopic/unknown organisms
-            self.draw_crystalline_fractal(draw, rgb_colors, depth, complexity, rotation_factor, scale_factor, "crystal")
-        
-        # Apply post-processing effects
-        img = self.apply_artistic_effects(img, token_id)
-        
-        return img
+            buffer = self.draw_crystalline_fractal(draw, rgb_colors, depth, complexity, rotation_factor, scale_factor, "crystal")
+        
+        if draw is None:
+            rasterize = rasterize_jit if self.rasterizer == "jit" else rasterize_scanline
+            canvas, img = img, rasterize(img, buffer)
+            canvas_pool.release(canvas)
+        
+        # Apply post-processing effects, only within the alpha bounding box
+        with tracer.span("effects"):
+            canvas, (img, effect_pixels) = img, within_content(
+                img, lambda content: self.apply_artistic_effects(content, token_id, self.width * self.height))
+        if img is not canvas:
+            canvas_pool.release(canvas)
+        
+        render_stats = dict(buffer.stats)
+        render_stats["effectPixels"] = effect_pixels
+        return img, render_stats
     
-    def create_background_gradient(self, draw: ImageDraw.Draw, colors: List[Tuple[int, int, int]], variant: int):
-        """Create a subtle background gradient"""
+    def create_background_gradient(self, colors: List[Tuple[int, int, int]], variant: int,
+                                   canvas: Image.Image = None) -> Image.Image:
+        """Create a new RGBA canvas with a subtle background gradient (or fill the given canvas)"""
         base_color = colors[variant % len(colors)]
         
-        # Create radial gradient
-        for r in range(0, self.width // 2, 10):
-            alpha = max(5, 30 - r // 20)
-            color = base_color + (alpha,)
-            draw.ellipse([
-                self.center_x - r, self.center_y - r,
-                self.center_x + r, self.center_y + r
-            ], fill=color)
+        # Radial gradient is built once per (size, color) and copied from the cache
+        return era_background(self.width, self.height, base_color, canvas)
     
+    @traced("draw")
     def draw_bilateral_fractal(self, draw: ImageDraw.Draw, colors: List[Tuple[int, int, int]], 
-                              depth: int, complexity: float, rotation: float, scale: float, pattern_type: str):
+                              depth: int, complexity: float, rotation: float, scale: float, pattern_type: str) -> PrimitiveBuffer:
         """Draw bilateral symmetry fractal (wings, bilateral organisms)"""
-        def draw_wing_recursive(x, y, size, level, angle, side_multiplier):
-            if level <= 0 or size < 8:
-                return
-            
-            alpha = int(255 * (level / depth) * 0.7)
-            color = colors[level % len(colors)] + (alpha,)
-            
-            # Wing shape
-            wing_points = []
-            for i in range(8):
-                t = i / 7
-                wing_x = x + side_multiplier * size * (0.8 * math.cos(t * math.pi) + 0.2 * math.cos(3 * t * math.pi))
-                wing_y = y + size * 0.6 * math.sin(t * math.pi) * (1 - t * 0.3)
-                
-                # Apply rotation
-                rotated_x = x + (wing_x - x) * math.cos(angle) - (wing_y - y) * math.sin(angle)
-                rotated_y = y + (wing_x - x) * math.sin(angle) + (wing_y - y) * math.cos(angle)
-                wing_points.extend([rotated_x, rotated_y])
-            
-            if len(wing_points) >= 6:
-                draw.polygon(wing_points, fill=color)
-            
-            # Recursive calls
-            new_size = size * (0.4 + complexity * 0.3)
-            positions = [
-                (0.7 * side_multiplier, -0.3, angle + 0.3),
-                (0.5 * side_multiplier, 0.4, angle - 0.2),
-                (0.3 * side_multiplier, -0.6, angle + 0.5)
-            ]
-            
-            for pos_x, pos_y, new_angle in positions:
-                new_x = x + pos_x * size
-                new_y = y + pos_y * size
-                draw_wing_recursive(new_x, new_y, new_size, level - 1, new_angle, side_multiplier)
-        
         # Draw both sides
         base_size = min(self.width, self.height) * 0.25 * scale
-        draw_wing_recursive(self.center_x, self.center_y, base_size, depth, rotation, 1)  # Right wing
-        draw_wing_recursive(self.center_x, self.center_y, base_size, depth, rotation, -1)  # Left wing
+        buffer = fractal_geometry.bilateral_fractal(self.center_x, self.center_y, base_size,
+                                                    colors, depth, complexity, rotation,
+                                                    self.detail_limits)
+        if draw is not None:
+            fractal_geometry.rasterize_imagedraw(draw, buffer)
+        return buffer
     
+    @traced("draw")
     def draw_radial_fractal(self, draw: ImageDraw.Draw, colors: List[Tuple[int, int, int]], 
-                           depth: int, complexity: float, rotation: float, scale: float, pattern_type: str):
+                           depth: int, complexity: float, rotation: float, scale: float, pattern_type: str) -> PrimitiveBuffer:
         """Draw radial symmetry fractal (jellyfish, sea lilies)"""
-        def draw_tentacle_recursive(x, y, size, level, angle):
-            if level <= 0 or size < 5:
-                return
-            
-            alpha = int(255 * (level / depth) * 0.8)
-            color = colors[level % len(colors)] + (alpha,)
-            
-            # Tentacle/arm shape
-            segments = 12
-            tentacle_points = []
-            
-            for i in range(segments):
-                t = i / (segments - 1)
-                # Curved tentacle shape
-                curve_x = x + size * t * math.cos(angle + t * complexity)
-                curve_y = y + size * t * math.sin(angle + t * complexity)
-                width = size * 0.1 * (1 - t * 0.7)
-                
-                # Add width to create tentacle body
-                perp_angle = angle + math.pi / 2
-                p1_x = curve_x + width * math.cos(perp_angle)
-                p1_y = curve_y + width * math.sin(perp_angle)
-                p2_x = curve_x - width * math.cos(perp_angle)
-                p2_y = curve_y - width * math.sin(perp_angle)
-                
-                if i == 0:
-                    tentacle_points.extend([p1_x, p1_y])
-                tentacle_points.extend([p1_x, p1_y])
-            
-            # Add return path
-            for i in range(segments - 1, -1, -1):
-                t = i / (segments - 1)
-                curve_x = x + size * t * math.cos(angle + t * complexity)
-                curve_y = y + size * t * math.sin(angle + t * complexity)
-                width = size * 0.1 * (1 - t * 0.7)
-                
-                perp_angle = angle + math.pi / 2
-                p2_x = curve_x - width * math.cos(perp_angle)
-                p2_y = curve_y - width * math.sin(perp_angle)
-                tentacle_points.extend([p2_x, p2_y])
-            
-            if len(tentacle_points) >= 6:
-                draw.polygon(tentacle_points, fill=color)
-            
-            # Recursive calls along tentacle
-            new_size = size * (0.3 + complexity * 0.2)
-            for i in range(2, 4):
-                t = i / 4
-                new_x = x + size * t * math.cos(angle + t * complexity * 0.5)
-                new_y = y + size * t * math.sin(angle + t * complexity * 0.5)
-                new_angle = angle + (t - 0.5) * complexity
-                draw_tentacle_recursive(new_x, new_y, new_size, level - 1, new_angle)
-        
         # Draw radial pattern
         base_size = min(self.width, self.height) * 0.2 * scale
-        num_arms = int(6 + complexity * 6)  # 6-12 arms
-        
-        for i in range(num_arms):
-            angle = rotation + (i / num_arms) * 2 * math.pi
-            draw_tentacle_recursive(self.center_x, self.center_y, base_size, depth, angle)
+        buffer = fractal_geometry.radial_fractal(self.center_x, self.center_y, base_size,
+                                                 colors, depth, complexity, rotation,
+                                                 self.detail_limits)
+        if draw is not None:
+            fractal_geometry.rasterize_imagedraw(draw, buffer)
+        return buffer
     
+    @traced("draw")
     def draw_spiral_fractal(self, draw: ImageDraw.Draw, colors: List[Tuple[int, int, int]], 
-                           depth: int, complexity: float, rotation: float, scale: float, pattern_type: str):
+                           depth: int, complexity: float, rotation: float, scale: float, pattern_type: str) -> PrimitiveBuffer:
         """Draw spiral fractal (ammonites, shells)"""
-        def draw_spiral_recursive(x, y, size, level, start_angle, spiral_tightness):
-            if level <= 0 or size < 8:
-                return
-            
-            alpha = int(255 * (level / depth) * 0.9)
-            color = colors[level % len(colors)] + (alpha,)
-            
-            # Draw spiral shell
-            points = []
-            turns = 2 + complexity * 2
-            segments = int(30 * turns)
-            
-            for i in range(segments):
-                t = i / segments
-                angle = start_angle + t * turns * 2 * math.pi
-                radius = size * (0.1 + t * 0.9) * spiral_tightness
-                
-                spiral_x = x + radius * math.cos(angle)
-                spiral_y = y + radius * math.sin(angle)
-                points.extend([spiral_x, spiral_y])
-            
-            # Draw spiral as thick line
-            if len(points) >= 4:
-                for i in range(0, len(points) - 2, 2):
-                    if i + 3 < len(points):
-                        draw.line([points[i], points[i+1], points[i+2], points[i+3]], 
-                                 fill=color, width=max(1, int(size * 0.05)))
-            
-            # Recursive spirals
-            new_size = size * (0.35 + complexity * 0.25)
-            positions = [
-                (0.6, 0, start_angle + math.pi/3),
-                (-0.4, 0.3, start_angle - math.pi/4),
-                (0.2, -0.5, start_angle + math.pi/2)
-            ]
-            
-            for pos_x, pos_y, new_angle in positions:
-                new_x = x + pos_x * size
-                new_y = y + pos_y * size
-                draw_spiral_recursive(new_x, new_y, new_size, level - 1, new_angle, spiral_tightness * 0.8)
-        
         base_size = min(self.width, self.height) * 0.3 * scale
-        draw_spiral_recursive(self.center_x, self.center_y, base_size, depth, rotation, 1.0)
+        buffer = fractal_geometry.spiral_fractal(self.center_x, self.center_y, base_size,
+                                                 colors, depth, complexity, rotation,
+                                                 self.detail_limits)
+        if draw is not None:
+            fractal_geometry.rasterize_imagedraw(draw, buffer)
+        return buffer
     
+    @traced("draw")
     def draw_branching_fractal(self, draw: ImageDraw.Draw, colors: List[Tuple[int, int, int]], 
-                              depth: int, complexity: float, rotation: float, scale: float, pattern_type: str):
+                              depth: int, complexity: float, rotation: float, scale: float, pattern_type: str) -> PrimitiveBuffer:
         """Draw branching fractal (coral, trees, stromatolites)"""
-        def draw_branch_recursive(x, y, size, level, angle, thickness):
-            if level <= 0 or size < 10:
-                return
-            
-            alpha = int(255 * (level / depth) * 0.8)
-            color = colors[level % len(colors)] + (alpha,)
-            
-            # Draw main branch
-            end_x = x + size * math.cos(angle)
-            end_y = y + size * math.sin(angle)
-            
-            draw.line([x, y, end_x, end_y], fill=color, width=max(1, int(thickness)))
-            
-            # Draw branch node
-            node_size = thickness * 0.8
-            draw.ellipse([x - node_size, y - node_size, x + node_size, y + node_size], fill=color)
-            
-            # Recursive branches
-            new_size = size * (0.6 + complexity * 0.2)
-            new_thickness = thickness * 0.7
-            branch_angles = [
-                angle - 0.5 - complexity * 0.3,
-                angle + 0.5 + complexity * 0.3,
-                angle - 0.2,
-                angle + 0.2
-            ]
-            
-            for branch_angle in branch_angles[:int(2 + complexity * 2)]:
-                branch_x = x + size * 0.7 * math.cos(angle)
-                branch_y = y + size * 0.7 * math.sin(angle)
-                draw_branch_recursive(branch_x, branch_y, new_size, level - 1, branch_angle, new_thickness)
-        
         base_size = min(self.width, self.height) * 0.25 * scale
         base_thickness = base_size * 0.08
         
         # Multiple main branches
-        main_branches = int(3 + complexity * 3)
-        for i in range(main_branches):
-            branch_angle = rotation + (i / main_branches) * 2 * math.pi
-            draw_branch_recursive(self.center_x, self.center_y, base_size, depth, branch_angle, base_thickness)
+        buffer = fractal_geometry.branching_fractal(self.center_x, self.center_y, base_size, base_thickness,
+                                                    colors, depth, complexity, rotation,
+                                                    self.detail_limits)
+        if draw is not None:
+            fractal_geometry.rasterize_imagedraw(draw, buffer)
+        return buffer
     
+    @traced("draw")
     def draw_segmented_fractal(self, draw: ImageDraw.Draw, colors: List[Tuple[int, int, int]], 
-                              depth: int, complexity: float, rotation: float, scale: float, pattern_type: str):
+                              depth: int, complexity: float, rotation: float, scale: float, pattern_type: str) -> PrimitiveBuffer:
         """Draw segmented fractal (trilobites, vertebrates)"""
-        def draw_segment_recursive(x, y, size, level, angle, segment_width):
-            if level <= 0 or size < 12:
-                return
-            
-            alpha = int(255 * (level / depth) * 0.8)
-            color = colors[level % len(colors)] + (alpha,)
-            
-            # Draw main segment
-            segment_length = size * 0.8
-            segment_points = []
-            
-            # Create segmented body shape
-            for i in range(8):
-                t = i / 7
-                seg_x = x + (t - 0.5) * segment_length * math.cos(angle)
-                seg_y = y + (t - 0.5) * segment_length * math.sin(angle)
-                
-                # Add width variation
-                width = segment_width * (1 - abs(t - 0.5) * 0.5)
-                perp_angle = angle + math.pi / 2
-                
-                p1_x = seg_x + width * math.cos(perp_angle)
-                p1_y = seg_y + width * math.sin(perp_angle)
-                segment_points.extend([p1_x, p1_y])
-            
-            # Add return path
-            for i in range(7, -1, -1):
-                t = i / 7
-                seg_x = x + (t - 0.5) * segment_length * math.cos(angle)
-                seg_y = y + (t - 0.5) * segment_length * math.sin(angle)
-                
-                width = segment_width * (1 - abs(t - 0.5) * 0.5)
-                perp_angle = angle + math.pi / 2
-                
-                p2_x = seg_x - width * math.cos(perp_angle)
-                p2_y = seg_y - width * math.sin(perp_angle)
-                segment_points.extend([p2_x, p2_y])
-            
-            if len(segment_points) >= 6:
-                draw.polygon(segment_points, fill=color)
-            
-            # Recursive segments
-            new_size = size * (0.4 + complexity * 0.3)
-            new_width = segment_width * 0.7
-            
-            positions = [
-                (0.6, 0, angle),
-                (-0.6, 0, angle + math.pi),
-                (0, 0.5, angle + math.pi/2),
-                (0, -0.5, angle - math.pi/2)
-            ]
-            
-            for pos_x, pos_y, new_angle in positions[:int(2 + complexity * 2)]:
-                new_x = x + pos_x * size
-                new_y = y + pos_y * size
-                draw_segment_recursive(new_x, new_y, new_size, level - 1, new_angle, new_width)
-        
         base_size = min(self.width, self.height) * 0.2 * scale
         base_width = base_size * 0.3
-        draw_segment_recursive(self.center_x, self.center_y, base_size, depth, rotation, base_width)
+        buffer = fractal_geometry.segmented_fractal(self.center_x, self.center_y, base_size, base_width,
+                                                    colors, depth, complexity, rotation,
+                                                    self.detail_limits)
+        if draw is not None:
+            fractal_geometry.rasterize_imagedraw(draw, buffer)
+        return buffer
     
+    @traced("draw")
     def draw_crystalline_fractal(self, draw: ImageDraw.Draw, colors: List[Tuple[int, int, int]], 
-                                depth: int, complexity: float, rotation: float, scale: float, pattern_type: str):
+                                depth: int, complexity: float, rotation: float, scale: float, pattern_type: str) -> PrimitiveBuffer:
         """Draw crystalline fractal (microscopic organisms, minerals)"""
-        def draw_crystal_recursive(x, y, size, level, angle):
-            if level <= 0 or size < 8:
-                return
-            
-            alpha = int(255 * (level / depth) * 0.9)
-            color = colors[level % len(colors)] + (alpha,)
-            
-            # Draw crystal shape (hexagon)
-            crystal_points = []
-            sides = 6
-            for i in range(sides):
-                crystal_angle = angle + (i / sides) * 2 * math.pi
-                crystal_x = x + size * 0.5 * math.cos(crystal_angle)
-                crystal_y = y + size * 0.5 * math.sin(crystal_angle)
-                crystal_points.extend([crystal_x, crystal_y])
-            
-            draw.polygon(crystal_points, fill=color)
-            
-            # Inner crystal
-            inner_points = []
-            for i in range(sides):
-                crystal_angle = angle + (i / sides) * 2 * math.pi
-                crystal_x = x + size * 0.25 * math.cos(crystal_angle)
-                crystal_y = y + size * 0.25 * math.sin(crystal_angle)
-                inner_points.extend([crystal_x, crystal_y])
-            
-            inner_color = colors[(level + 1) % len(colors)] + (alpha // 2,)
-            draw.polygon(inner_points, fill=inner_color)
-            
-            # Recursive crystals
-            new_size = size * (0.35 + complexity * 0.25)
-            for i in range(sides):
-                crystal_angle = angle + (i / sides) * 2 * math.pi
-                new_x = x + size * 0.8 * math.cos(crystal_angle)
-                new_y = y + size * 0.8 * math.sin(crystal_angle)
-                new_angle = crystal_angle + complexity
-                draw_crystal_recursive(new_x, new_y, new_size, level - 1, new_angle)
-        
         base_size = min(self.width, self.height) * 0.2 * scale
-        draw_crystal_recursive(self.center_x, self.center_y, base_size, depth, rotation)
+        buffer = fractal_geometry.crystalline_fractal(self.center_x, self.center_y, base_size,
+                                                      colors, depth, complexity, rotation,
+                                                      self.detail_limits)
+        if draw is not None:
+            fractal_geometry.rasterize_imagedraw(draw, buffer)
+        return buffer
     
-    def apply_artistic_effects(self, img: Image.Image, token_id: int) -> Image.Image:
-        """Apply post-processing effects for artistic quality"""
+    def apply_artistic_effects(self, img: Image.Image, token_id: int,
+                               canvas_pixels: int = None) -> Image.Image:
+        """Apply post-processing effects for artistic quality
+        
+        canvas_pixels is the full canvas size when img is a crop of it.
+        """
         # Subtle blur for organic feel
-        img = img.filter(ImageFilter.GaussianBlur(radius=0.5))  # Reduced blur radius to preserve detail
+        img = img.filter(SOFTEN)  # Reduced blur radius to preserve detail
         
         # Enhance colors based on token_id
-        np.random.seed(token_id)
-        
-        # Color enhancement
-        enhancer = ImageEnhance.Color(img)
-        color_factor = 1.1 + np.random.random() * 0.2  # Reduced color enhancement to prevent oversaturation
-        img = enhancer.enhance(color_factor)
+        rng = token_rng(token_id, "effects", self.collection_seed)
+        color_factor = 1.1 + rng.random() * 0.2  # Reduced color enhancement to prevent oversaturation
+        contrast_factor = 1.0 + rng.random() * 0.15  # Reduced contrast enhancement
         
-        # Contrast enhancement
-        enhancer = ImageEnhance.Contrast(img)
-        contrast_factor = 1.0 + np.random.random() * 0.15  # Reduced contrast enhancement
-        img = enhancer.enhance(contrast_factor)
+        # Color and contrast enhancement in one pass
+        img = fused_enhance(img, color=color_factor, contrast=contrast_factor, canvas_pixels=canvas_pixels)
         
         # Subtle sharpening
-        img = img.filter(ImageFilter.UnsharpMask(radius=0.8, percent=110, threshold=2))  # Reduced sharpening
+        img = img.filter(SHARPEN)  # Reduced sharpening
         
         return img
     
-    def optimize_for_size(self, img: Image.Image, target_size_kb: int = 8) -> Image.Image:
-        """Optimize image to target file size while preserving quality"""
+    def optimize_for_size(self, img: Image.Image, target_size_kb: int = 8,
+                          traits: Dict[str, Any] = None, sequence: int = None) -> Dict[str, Any]:
+        """Optimize image to target file size while preserving quality
+        
+        Returns the encoder result: the winning encoded bytes plus format,
+        quality, exact size and number of encodes tried. Given the token's
+        traits and its position in the run (sequence), the size predictor
+        guesses the winning strategy first; the result then carries the
+        "features" the caller must pass to size_predictor.observe in
+        sequence order.
+        """
+        features = None
+        if traits is not None and sequence is not None and self.size_predictor is not None:
+            with tracer.span("predict", "features"):
+                features = image_features(img, traits.get("fractalDepth", 0))
+        
         # Convert RGBA to RGB with white background for better compression
+        background = None
         if img.mode == 'RGBA':
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            background.paste(img, mask=img.split()[-1])  # Use alpha channel as mask
-            img = background
-        
-        # Try different optimization strategies
+            with tracer.span("flatten"):
+                background = canvas_pool.acquire('RGB', img.size, (255, 255, 255))
+                # Only the alpha bounding box can differ from the white background
+                box = img.getchannel('A').getbbox()
+                if box is not None:
+                    content = img.crop(box)
+                    background.paste(content, box[:2], mask=content.getchannel('A'))  # Use alpha channel as mask
+                    tracer.count("pixels.flatten", (box[2] - box[0]) * (box[3] - box[1]))
+                img = background
+        
+        # Try formats in order; lossy ones binary-search quality below the preferred setting
         strategies = [
-            {'format': 'WebP', 'quality': 85, 'method': 6},
-            {'format': 'WebP', 'quality': 75, 'method': 6},
-            {'format': 'JPEG', 'quality': 90, 'optimize': True, 'progressive': True},
-            {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True},
-            {'format': 'JPEG', 'quality': 80, 'optimize': True, 'progressive': True},
-            {'format': 'PNG', 'optimize': True, 'compress_level': 9}
+            {'format': 'WebP', 'preferred_quality': 85, 'min_quality': 75, 'options': {'method': 6}},
+            {'format': 'JPEG', 'preferred_quality': 90, 'min_quality': 80,
+             'options': {'optimize': True, 'progressive': True}},
+            # Palette-optimized PNG as the lossless-ish fallback
+            {'format': 'PNG', 'prepare': lambda rgb: rgb.convert('P', palette=Image.ADAPTIVE, colors=128),
+             'options': {'optimize': True, 'compress_level': 9}}
         ]
         
-        best_img = None
-        best_size = float('inf')
-        best_format = 'PNG'
-        
-        for strategy in strategies:
-            # Create a copy for testing
-            test_img = img.copy()
-            
-            # Apply palette optimization for PNG
-            if strategy['format'] == 'PNG':
-                # Convert to palette mode with optimized colors
-                test_img = test_img.convert('P', palette=Image.ADAPTIVE, colors=128)
-                test_img = test_img.convert('RGB')  # Convert back for consistency
-            
-            # Test file size
-            import io
-            buffer = io.BytesIO()
-            
-            if strategy['format'] == 'WebP':
-                test_img.save(buffer, format='WebP', 
-                            quality=strategy['quality'], 
-                            method=strategy['method'],
-                            optimize=True)
-            elif strategy['format'] == 'JPEG':
-                test_img.save(buffer, format='JPEG',
-                            quality=strategy['quality'],
-                            optimize=strategy.get('optimize', True),
-                            progressive=strategy.get('progressive', False))
-            else:  # PNG
-                test_img.save(buffer, format='PNG',
-                            optimize=strategy.get('optimize', True),
-                            compress_level=strategy.get('compress_level', 6))
-            
-            size_kb = len(buffer.getvalue()) / 1024
-            
-            # If under target size, this is our best option
-            if size_kb <= target_size_kb:
-                best_img = test_img
-                best_size = size_kb
-                best_format = strategy['format']
-                break
-            
-            # Track the smallest size even if over target
-            if size_kb < best_size:
-                best_img = test_img
-                best_size = size_kb
-                best_format = strategy['format']
+        if features is not None:
+            result = self.size_predictor.encode(img, target_size_kb * 1024, strategies,
+                                                features, traits.get("organism", ""), sequence)
+            result["features"] = features
+        else:
+            result = encode_to_target(img, target_size_kb * 1024, strategies)
         
-        return best_img, best_format, best_size
+        # Only the encoded bytes outlive this call
+        canvas_pool.release(background)
+        return result
+
+def render_token(generator: AdvancedFractalGenerator, token_id: int) -> Dict[str, Any]:
+    """Render stage: the token's RGBA image and base metadata"""
+    with tracer.token(token_id):
+        result = generator.generate_organism_fractal(token_id)
+    result["token_id"] = token_id
+    return result
+
+def encode_token(generator: AdvancedFractalGenerator, rendered: Dict[str, Any],
+                 sequence: int = None) -> Dict[str, Any]:
+    """Encode stage: compress the render under 8KB and add the optimization metadata
+    
+    sequence is the token's position in the run, which enables the strategy
+    predictor (write_token then feeds it the outcome).
+    """
+    # Timings recorded by a pool worker while rendering
+    tracer.merge(rendered.pop("trace", None))
+    
+    metadata = rendered["metadata"]
+    with tracer.token(rendered["token_id"]):
+        encoded = generator.optimize_for_size(rendered["image"], target_size_kb=8, traits=metadata,
+                                              sequence=sequence)
+    # The render is not needed after encoding; the next token can draw on it
+    canvas_pool.release(rendered.pop("image"))
+    actual_size = encoded["size_bytes"] / 1024
+    
+    # Update metadata with optimization info
+    metadata["file_size_kb"] = round(actual_size, 2)
+    metadata["format"] = encoded["format"].lower()
+    metadata["quality"] = encoded["quality"]
+    metadata["mime_type"] = encoded["mime_type"]
+    metadata["optimized_for_8kb"] = actual_size <= 8.0
+    metadata["image_dimensions"] = "512x512"
+    
+    return {
+        "token_id": rendered["token_id"],
+        "metadata": metadata,
+        "encoded": encoded,
+        "image_digest": bytes_sha256(encoded["data"])
+    }
+
+def write_token(generator: AdvancedFractalGenerator, manifest: RunManifest, metadata_sink: MetadataSink,
+                encoded_token: Dict[str, Any]) -> Dict[str, Any]:
+    """Write stage: persist image and metadata, then record the token in the manifest
+    
+    Runs on a single thread in token order; returns the manifest entry.
+    """
+    token_id = encoded_token["token_id"]
+    encoded = encoded_token["encoded"]
+    
+    # Write the winning encode as-is; its length is the exact file size
+    image_filename = f"generated_nfts/images/{token_id}.{encoded['extension']}"
+    with tracer.token(token_id):
+        write_atomic(image_filename, encoded["data"])
+    
+    metadata_filename, metadata_json = metadata_sink.write(token_id, encoded_token["metadata"])
+    
+    # The predictor learns here, in token order, never from the encode threads
+    if encoded.get("features") is not None:
+        generator.size_predictor.observe(encoded["features"], encoded_token["metadata"]["organism"], encoded)
+    
+    manifest.record(
+        token_id=token_id,
+        params_digest=generator.params_hash(token_id),
+        image_path=image_filename,
+        image_digest=encoded_token["image_digest"],
+        size_bytes=encoded["size_bytes"],
+        image_format=encoded["format"].lower(),
+        metadata_path=metadata_filename,
+        metadata_digest=bytes_sha256(metadata_json),
+        encodeAttempts=encoded["attempts"],
+        predictionHit=encoded.get("prediction_hit") if encoded.get("predicted") else None
+    )
+    return manifest.entries[token_id]
+
+# Per-process generator used by pool workers (set by _init_worker)
+_worker_generator = None
+
+def _init_worker(width: int, height: int, collection_seed: int, rasterizer: str, trace: bool):
+    global _worker_generator
+    _worker_generator = AdvancedFractalGenerator(width=width, height=height, collection_seed=collection_seed,
+                                                 predict_encoding=False, rasterizer=rasterizer)
+    reuse_pillow_blocks()
+    if trace:
+        tracer.enable(collect=True)
+
+def _render_token_in_worker(token_id: int) -> Dict[str, Any]:
+    result = render_token(_worker_generator, token_id)
+    if tracer.enabled:
+        result["trace"] = tracer.drain()
+    return result
 
-def generate_all_organisms():
-    """Generate all 4444 unique organism fractals optimized for 8KB"""
-    generator = AdvancedFractalGenerator(width=512, height=512)  # Using 512x512 for better compression
+def generate_all_organisms(workers: int = 1, collection_seed: int = COLLECTION_SEED, resume: bool = False,
+                           predict_encoding: bool = True, encode_threads: int = 2, queue_size: int = 8,
+                           trace_path: str = None, rasterizer: str = "imagedraw"):
+    """Generate all 4444 unique organism fractals optimized for 8KB
+    
+    Tokens stream through render -> encode -> write stages connected by
+    bounded queues (see pipeline.py). Rendering runs in this process or,
+    with workers > 1, in a process pool; encode_threads threads encode
+    concurrently; a single writer persists tokens in order. Results are
+    consumed in token order, so progress output and statistics are identical
+    to the serial run regardless of which worker finishes first.
+    
+    Metadata goes through a background sink: compact generated_nfts/metadata/{id}.json
+    files plus generated_nfts/metadata.ndjson with one line per token.
+    
+    Every finished token is recorded in generated_nfts/manifest.ndjson. With
+    resume=True, tokens whose parameters, image and metadata still match the
+    manifest are skipped and only missing or corrupt tokens are rendered.
+    
+    The encoder strategy predictor learns from finished tokens in token
+    order, in the write stage, and each prediction uses a fixed prefix of
+    them (see size_predictor.py). Where encoded size is not monotone in
+    quality a verified guess can settle one quality step away from the full
+    ladder, but the same guess is made in every run, so output is
+    byte-identical across runs, worker counts and encode threads.
+    
+    With trace_path, per-token stage timings are written there as NDJSON and
+    a p50/p95/p99 table per stage is printed at the end.
+    
+    rasterizer selects how primitives are painted: "imagedraw", or the
+    alpha-compositing "numpy" backend or its Numba-compiled twin "jit"
+    (which falls back to "numpy" when Numba is not installed). Switching
+    between ImageDraw and compositing re-renders on resume.
+    
+    Canvases are recycled through the per-process canvas pool once a token
+    is encoded; with tracing on, the pool.* counters show allocations
+    against reuses.
+    """
+    generator = AdvancedFractalGenerator(width=512, height=512, collection_seed=collection_seed,
+                                         predict_encoding=predict_encoding, rasterizer=rasterizer)  # Using 512x512 for better compression
+    if trace_path:
+        tracer.enable(trace_path)
+    reuse_pillow_blocks()
     
     # Create output directories
     os.makedirs("generated_nfts/images", exist_ok=True)
     os.makedirs("generated_nfts/metadata", exist_ok=True)
     
     print("Starting generation of 4444 unique organism fractals (optimized for 8KB)...")
+    if workers > 1:
+        print(f"Using {workers} worker processes")
     
     total_size = 0
     size_stats = []
+    encode_stats = {"tokens": 0, "encodes": 0, "predictions": 0, "hits": 0}
+    token_ids = range(1, 4445)  # 1 to 4444
     
-    for token_id in range(1, 4445):  # 1 to 4444
-        if token_id % 100 == 0:
-            avg_size = sum(size_stats) / len(size_stats) if size_stats else 0
-            print(f"Generated {token_id}/4444 organisms... Avg size: {avg_size:.1f}KB")
-        
-        # Generate organism
-        result = generator.generate_organism_fractal(token_id)
-        
-        # Optimize for size
-        optimized_img, best_format, file_size_kb = generator.optimize_for_size(result["image"], target_size_kb=8)
-        
-        # Determine file extension
-        ext = 'webp' if best_format == 'WebP' else ('jpg' if best_format == 'JPEG' else 'png')
-        
-        # Save optimized image
-        image_filename = f"generated_nfts/images/{token_id}.{ext}"
-        
-        if best_format == 'WebP':
-            optimized_img.save(image_filename, format='WebP', quality=85, method=6, optimize=True)
-        elif best_format == 'JPEG':
-            optimized_img.save(image_filename, format='JPEG', quality=85, optimize=True, progressive=True)
-        else:  # PNG
-            optimized_img.save(image_filename, format='PNG', optimize=True, compress_level=9)
-        
-        # Track size statistics
-        actual_size = os.path.getsize(image_filename) / 1024
-        size_stats.append(actual_size)
-        total_size += actual_size
-        
-        # Update metadata with optimization info
-        result["metadata"]["file_size_kb"] = round(actual_size, 2)
-        result["metadata"]["format"] = best_format.lower()
-        result["metadata"]["optimized_for_8kb"] = actual_size <= 8.0
-        result["metadata"]["image_dimensions"] = "512x512"
-        
-        # Save metadata
-        metadata_filename = f"generated_nfts/metadata/{token_id}.json"
-        with open(metadata_filename, 'w') as f:
-            json.dump(result["metadata"], f, indent=2)
+    manifest = RunManifest("generated_nfts/manifest.ndjson", resume=resume)
+    metadata_sink = MetadataSink("generated_nfts/metadata", "generated_nfts/metadata.ndjson", resume=resume)
+    finished = {}
+    if resume:
+        for token_id in token_ids:
+            entry = manifest.verified_entry(token_id, generator.params_hash(token_id))
+            if entry is not None:
+                finished[token_id] = entry
+        print(f"Resuming: {len(finished)}/4444 tokens verified, {4444 - len(finished)} to render")
+    pending = [token_id for token_id in token_ids if token_id not in finished]
+    # Position of each token in this run, for the strategy predictor
+    sequence = {token_id: index for index, token_id in enumerate(pending)}
+    
+    pool = None
+    if workers > 1 and pending:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker,
+                                    initargs=(generator.width, generator.height, collection_seed, rasterizer,
+                                              tracer.enabled))
+        # Ordered, with a bounded number of renders in flight
+        rendered = bounded_imap(pool, _render_token_in_worker, pending, window=workers * 2)
+    else:
+        rendered = (render_token(generator, token_id) for token_id in pending)
+    
+    pipeline = StagedPipeline([
+        ("encode", lambda item: encode_token(generator, item, sequence[item["token_id"]]), encode_threads),
+        ("write", lambda item: write_token(generator, manifest, metadata_sink, item), 1),
+    ], queue_size=queue_size)
+    written = pipeline.run(rendered)
+    
+    try:
+        for token_id in token_ids:
+            if token_id % 100 == 0:
+                avg_size = sum(size_stats) / len(size_stats) if size_stats else 0
+                print(f"Generated {token_id}/4444 organisms... Avg size: {avg_size:.1f}KB")
+            
+            entry = finished.get(token_id)
+            if entry is None:
+                entry = next(written)
+                
+                # Encoder effort for tokens rendered in this run
+                encode_stats["tokens"] += 1
+                encode_stats["encodes"] += entry["encodeAttempts"]
+                if entry["predictionHit"] is not None:
+                    encode_stats["predictions"] += 1
+                    encode_stats["hits"] += entry["predictionHit"]
+            
+            # Track size statistics
+            actual_size = entry["sizeBytes"] / 1024
+            size_stats.append(actual_size)
+            total_size += actual_size
+    finally:
+        # Metadata must be on disk before the manifest that vouches for it is compacted
+        metadata_sink.close()
+        manifest.close()
+        tracer.close()
+        if pool is not None:
+            pool.terminate()
     
     # Final statistics
     avg_size = total_size / 4444
@@ -605,6 +592,15 @@ def generate_all_organisms():
     print(f"Average file size: {avg_size:.2f}KB")
     print(f"Files under 8KB: {under_8kb}/4444 ({under_8kb/4444*100:.1f}%)")
     print(f"Total collection size: {total_size:.1f}KB ({total_size/1024:.1f}MB)")
+    if encode_stats["tokens"]:
+        hit_rate = encode_stats["hits"] / encode_stats["predictions"] * 100 if encode_stats["predictions"] else 0
+        print(f"Encodes per token: {encode_stats['encodes'] / encode_stats['tokens']:.2f} "
+              f"(strategy predictor hit rate {hit_rate:.1f}% over {encode_stats['predictions']} predictions)")
+        print("\nPipeline stages:")
+        print(pipeline.format_summary())
+    if tracer.enabled:
+        print(f"\nStage timings (trace: {trace_path}):")
+        print(tracer.format_summary())
     
     # Generate collection metadata
     collection_metadata = {
@@ -627,4 +623,26 @@ def generate_all_organisms():
         json.dump(collection_metadata, f, indent=2)
 
 if __name__ == "__main__":
-    generate_all_organisms()
+    parser = argparse.ArgumentParser(description="Generate the 4444 organism fractal collection")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes (default: 1, serial)")
+    parser.add_argument("--seed", type=int, default=COLLECTION_SEED,
+                        help=f"collection seed for per-token RNG streams (default: {COLLECTION_SEED})")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip tokens whose outputs still match generated_nfts/manifest.ndjson")
+    parser.add_argument("--no-predict", action="store_true",
+                        help="always run the full encoder ladder instead of predicting the winning strategy")
+    parser.add_argument("--encode-threads", type=int, default=2,
+                        help="threads in the encode stage (default: 2)")
+    parser.add_argument("--queue-size", type=int, default=8,
+                        help="tokens buffered between pipeline stages (default: 8)")
+    parser.add_argument("--trace", metavar="PATH", default=None,
+                        help="record per-token stage timings to this NDJSON file and print a summary")
+    parser.add_argument("--rasterizer", choices=RASTERIZERS, default="imagedraw",
+                        help="primitive rasterizer: imagedraw (default), numpy (batched, alpha-composited) "
+                             "or jit (same pixels as numpy, compiled with Numba when installed)")
+    args = parser.parse_args()
+    
+    generate_all_organisms(workers=args.workers, collection_seed=args.seed, resume=args.resume,
+                           predict_encoding=not args.no_predict, encode_threads=args.encode_threads,
+                           queue_size=args.queue_size, trace_path=args.trace, rasterizer=args.rasterizer)
@@ -1,15 +1,17 @@
 import numpy as np
 from PIL import Image, ImageDraw, ImageFilter, ImageEnhance
-import random
 import math
 import json
 from typing import Dict, List, Tuple, Optional
 
+from seeding import COLLECTION_SEED, token_rng
+
 class AdvancedFractalGenerator:
-    def __init__(self):
+    def __init__(self, collection_seed=COLLECTION_SEED):
         self.width = 1024
         self.height = 1024
         self.center = (self.width // 2, self.height // 2)
+        self.collection_seed = collection_seed
         
     def generate_advanced_fractal(self, traits: Dict) -> Image.Image:
         """Generate fractal with advanced traits"""
@@ -42,7 +44,10 @@ class AdvancedFractalGenerator:
         
         # Apply hybrid era mixing if enabled
         if traits.get('hybridEra'):
-            img = self._apply_hybrid_effect(img, traits['hybridEra'])
+            if 'tokenId' not in traits:
+                raise ValueError("hybridEra traits need a tokenId to seed the era mixing")
+            rng = token_rng(traits['tokenId'], "hybrid", self.collection_seed)
+            img = self._apply_hybrid_effect(img, traits['hybridEra'], rng)
         
         return img
     
@@ -234,7 +239,7 @@ class AdvancedFractalGenerator:
         
         return img
     
-    def _apply_hybrid_effect(self, img: Image.Image, hybrid_type: str) -> Image.Image:
+    def _apply_hybrid_effect(self, img: Image.Image, hybrid_type: str, rng: np.random.Generator) -> Image.Image:
         """Apply cross-era hybrid effects"""
         if hybrid_type == 'mixed':
             # Add multiple era characteristics
@@ -244,15 +249,15 @@ class AdvancedFractalGenerator:
             
             # Add random era-mixing elements
             for i in range(50):
-                x = random.randint(0, img.width)
-                y = random.randint(0, img.height)
-                size = random.randint(5, 20)
-                alpha = random.randint(30, 100)
+                x = int(rng.integers(0, img.width + 1))
+                y = int(rng.integers(0, img.height + 1))
+                size = int(rng.integers(5, 21))
+                alpha = int(rng.integers(30, 101))
                 
                 color = (
-                    random.randint(100, 255),
-                    random.randint(100, 255),
-                    random.randint(100, 255),
+                    int(rng.integers(100, 256)),
+                    int(rng.integers(100, 256)),
+                    int(rng.integers(100, 256)),
                     alpha
                 )
                 
@@ -333,6 +338,8 @@ def generate_advanced_collection():
     
     for i, traits in enumerate(advanced_traits):
         print(f"Generating advanced fractal {i+1}/4...")
+        # Token IDs seed each token's own random streams
+        traits = dict(traits, tokenId=i + 1)
         
         if traits.get('animation', False):
             # Generate animated GIF
@@ -2,14 +2,43 @@ import numpy as np
 from PIL import Image, ImageDraw, ImageFilter
 import colorsys
 import math
+import argparse
 
-def create_fractal_organism(organism_type, width=1024, height=1024, depth=4, complexity=0.7):
+from scanline import RASTERIZERS, PrimitiveRecorder, rasterize_scanline
+from raster_jit import rasterize_jit
+from encoders import encode_image, encoded_result, write_atomic
+from instrumentation import tracer
+
+# Profile picture, marketplace thumbnails and gallery previews
+AVATAR_SIZES = [1024, 512, 256, 128, 64]
+
+# The full-size avatar stays PNG for compatibility; for these flat-colored renders
+# lossless WebP is smaller than both PNG and lossy WebP at every preview size
+MASTER_ENCODING = {"format": "PNG", "options": {"optimize": True}}
+PREVIEW_ENCODING = {"format": "WebP", "options": {"lossless": True, "method": 4}}
+
+def create_fractal_organism(organism_type, width=1024, height=1024, depth=4, complexity=0.7,
+                            rasterizer="imagedraw", sizes=None, output_stem=None, encodings=None):
     """
     Generate high-quality fractal organism for avatar use
+    
+    rasterizer "imagedraw" draws each shape directly; "numpy" records the
+    shapes and composites them in one batch with proper alpha blending;
+    "jit" does the same with the Numba kernel when Numba is installed.
+    
+    With sizes (variant widths, e.g. AVATAR_SIZES) the organism is rendered
+    once at width x height and every variant is derived from it; see
+    export_variants for the return value, output_stem and encodings.
+    Without sizes the rendered image is returned.
     """
+    if rasterizer not in RASTERIZERS:
+        raise ValueError(f"Unknown rasterizer {rasterizer!r}, expected one of {', '.join(RASTERIZERS)}")
+    if sizes is not None and not all(0 < size <= width for size in sizes):
+        raise ValueError(f"Variant sizes must be between 1 and the render width {width}, got {sizes}")
+    
     # Create image with transparency
     img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
+    draw = ImageDraw.Draw(img) if rasterizer == "imagedraw" else PrimitiveRecorder()
     
     center_x, center_y = width // 2, height // 2
     
@@ -62,11 +91,72 @@ def create_fractal_organism(organism_type, width=1024, height=1024, depth=4, com
     # Start recursive drawing
     draw_organism_recursive(center_x, center_y, 300, depth)
     
+    if rasterizer != "imagedraw":
+        rasterize = rasterize_jit if rasterizer == "jit" else rasterize_scanline
+        img = rasterize(img, draw.buffer())
+    
     # Apply subtle glow effect
     img = img.filter(ImageFilter.GaussianBlur(radius=1))
     
+    if sizes is not None:
+        return export_variants(img, sizes, output_stem, encodings)
     return img
 
+def mipmap_variants(img, sizes):
+    """
+    Downscaled copies of img for each width in sizes, from one mipmap chain
+    
+    Each level halves the previous one with a box filter, in premultiplied
+    alpha so transparent edges do not darken. A width between two levels is
+    resampled with LANCZOS from the smallest level still at least that
+    wide. Sizes must not exceed img's width; returns {size: RGBA image},
+    largest first.
+    """
+    width, height = img.size
+    variants = {}
+    level = None
+    for size in sorted(set(sizes), reverse=True):
+        target = (size, max(1, round(height * size / width)))
+        if size == width:
+            variants[size] = img
+            continue
+        
+        if level is None:
+            level = img.convert('RGBa')
+        # Halve while the next level is still at least as wide as the variant
+        while level.width // 2 >= size:
+            with tracer.span("mipmap", str(level.width // 2)):
+                level = level.reduce(2)
+        
+        variant = level if level.size == target else level.resize(target, Image.Resampling.LANCZOS)
+        variants[size] = variant.convert('RGBA')
+    return variants
+
+def export_variants(img, sizes, output_stem=None, encodings=None):
+    """
+    Encode every size variant of a rendered avatar, each with its own settings
+    
+    encodings maps a size to {"format", optional "quality" and encoder
+    "options"}; sizes not in it use MASTER_ENCODING at the full width and
+    PREVIEW_ENCODING below it. With output_stem each variant is written to
+    "{output_stem}_{size}.{extension}". Returns {size: encoder result with
+    the variant "image" and, when written, its "path"}, largest first.
+    """
+    encodings = encodings or {}
+    variants = {}
+    for size, variant in mipmap_variants(img, sizes).items():
+        settings = encodings.get(size) or (MASTER_ENCODING if size == img.width else PREVIEW_ENCODING)
+        quality = settings.get("quality")
+        data = encode_image(variant, settings["format"], quality, **settings.get("options", {}))
+        
+        result = encoded_result(data, settings["format"], quality)
+        result["image"] = variant
+        if output_stem is not None:
+            result["path"] = f"{output_stem}_{size}.{result['extension']}"
+            write_atomic(result["path"], data)
+        variants[size] = result
+    return variants
+
 def draw_butterfly(draw, x, y, size, color, rotation):
     # Simplified butterfly shape
     wing_size = size * 0.3
@@ -191,12 +281,24 @@ def get_recursive_positions(organism_type, size, complexity):
 
 # Example usage
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fractal organism avatars")
+    parser.add_argument("--sizes", type=int, nargs="*",
+                        help=f"also export these variant widths from one render (no values: {AVATAR_SIZES})")
+    args = parser.parse_args()
+    sizes = (args.sizes or AVATAR_SIZES) if args.sizes is not None else None
+    
     organisms = ['butterfly', 'jellyfish', 'octopus', 'seahorse', 'coral', 'fish']
     
     for organism in organisms:
         print(f"Generating {organism} fractal...")
-        fractal_img = create_fractal_organism(organism, depth=5, complexity=0.8)
-        fractal_img.save(f"fractal_{organism}_avatar.png")
-        print(f"Saved fractal_{organism}_avatar.png")
+        if sizes is None:
+            fractal_img = create_fractal_organism(organism, depth=5, complexity=0.8)
+            fractal_img.save(f"fractal_{organism}_avatar.png")
+            print(f"Saved fractal_{organism}_avatar.png")
+        else:
+            variants = create_fractal_organism(organism, depth=5, complexity=0.8, sizes=sizes,
+                                               output_stem=f"fractal_{organism}_avatar")
+            for variant in variants.values():
+                print(f"Saved {variant['path']} ({variant['size_bytes'] / 1024:.1f}KB)")
     
     print("All fractal organisms generated successfully!")
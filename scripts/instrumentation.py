@@ -0,0 +1,225 @@
+"""
+Opt-in per-stage timing for the generators
+
+Hot paths wrap their work in `with tracer.span("stage"):`. While the tracer
+is disabled (the default) span() returns a shared no-op context manager
+after a single attribute check, so the instrumentation can stay in
+production code. When enabled, every span records wall time against the
+current token (set with `with tracer.token(token_id):`), events are streamed
+to an NDJSON trace file and summarize() reports call counts and
+p50/p95/p99 latency per stage.
+
+Pool workers enable a tracer without a trace file, drain() their events
+into the result they return, and the parent merge()s them.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional
+
+# Buffered trace lines per write
+FLUSH_EVENTS = 512
+
+
+class _NullSpan:
+    """Shared do-nothing context manager used while tracing is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "stage", "token_id", "started")
+
+    def __init__(self, tracer: "Tracer", stage: str, token_id: Optional[int]):
+        self.tracer = tracer
+        self.stage = stage
+        self.token_id = token_id
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.record(self.stage, time.perf_counter() - self.started, self.token_id)
+        return False
+
+
+class _TokenScope:
+    __slots__ = ("local", "token_id", "previous")
+
+    def __init__(self, local: threading.local, token_id: int):
+        self.local = local
+        self.token_id = token_id
+
+    def __enter__(self):
+        self.previous = getattr(self.local, "token_id", None)
+        self.local.token_id = self.token_id
+        return self
+
+    def __exit__(self, *exc_info):
+        self.local.token_id = self.previous
+        return False
+
+
+class Tracer:
+    """Collects stage timings and counters; disabled until enable() is called"""
+
+    def __init__(self):
+        self.enabled = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._durations: Dict[str, List[float]] = defaultdict(list)
+        self._pending: List[Dict[str, Any]] = []
+        self._trace_file = None
+        self._keep_events = False
+        self.counters: Dict[str, int] = defaultdict(int)
+
+    def enable(self, trace_path: Optional[str] = None, collect: bool = False):
+        """Start recording
+
+        With trace_path, events are streamed there as NDJSON; with collect,
+        they are kept for drain() (pool workers). Otherwise only the
+        summary data is kept.
+        """
+        if trace_path is not None:
+            os.makedirs(os.path.dirname(trace_path) or ".", exist_ok=True)
+            self._trace_file = open(trace_path, "w", encoding="utf-8")
+        self._keep_events = trace_path is not None or collect
+        self.enabled = True
+
+    def span(self, stage: str, detail: Optional[str] = None):
+        """Context manager timing one call of a stage (e.g. span("encode", "WebP"))"""
+        if not self.enabled:
+            return _NULL_SPAN
+        if detail is not None:
+            stage = f"{stage}.{detail}"
+        return _Span(self, stage, getattr(self._local, "token_id", None))
+
+    def token(self, token_id: int):
+        """Attribute spans on this thread to token_id until the block exits"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _TokenScope(self._local, token_id)
+
+    def count(self, name: str, amount: int = 1):
+        """Bump a named counter"""
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += amount
+
+    def record(self, stage: str, seconds: float, token_id: Optional[int] = None):
+        with self._lock:
+            self._durations[stage].append(seconds)
+            if self._keep_events:
+                self._pending.append({"token": token_id, "stage": stage, "ms": round(seconds * 1000, 4),
+                                      "pid": os.getpid()})
+                if self._trace_file is not None and len(self._pending) >= FLUSH_EVENTS:
+                    self._flush()
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Take the events recorded so far (pool workers return these to the parent)"""
+        with self._lock:
+            events, self._pending = self._pending, []
+            counters, self.counters = dict(self.counters), defaultdict(int)
+        if counters:
+            events.append({"counters": counters, "pid": os.getpid()})
+        return events
+
+    def merge(self, events: List[Dict[str, Any]]):
+        """Fold events drained from another process into this tracer"""
+        if not self.enabled or not events:
+            return
+        with self._lock:
+            for event in events:
+                if "counters" in event:
+                    for name, amount in event["counters"].items():
+                        self.counters[name] += amount
+                    continue
+                self._durations[event["stage"]].append(event["ms"] / 1000)
+                if self._keep_events:
+                    self._pending.append(event)
+            if self._trace_file is not None and len(self._pending) >= FLUSH_EVENTS:
+                self._flush()
+
+    def _flush(self):
+        self._trace_file.write("".join(json.dumps(event, separators=(",", ":")) + "\n"
+                                       for event in self._pending))
+        self._pending.clear()
+
+    def summarize(self) -> List[Dict[str, Any]]:
+        """Calls, total time and p50/p95/p99 per stage, slowest total first"""
+        with self._lock:
+            durations = {stage: sorted(values) for stage, values in self._durations.items()}
+
+        rows = []
+        for stage, values in durations.items():
+            rows.append({
+                "stage": stage,
+                "calls": len(values),
+                "total_s": round(sum(values), 3),
+                "p50_ms": round(_percentile(values, 50) * 1000, 3),
+                "p95_ms": round(_percentile(values, 95) * 1000, 3),
+                "p99_ms": round(_percentile(values, 99) * 1000, 3),
+            })
+        rows.sort(key=lambda row: row["total_s"], reverse=True)
+        return rows
+
+    def format_summary(self) -> str:
+        """Human-readable stage table plus counters"""
+        lines = [f"{'stage':<28} {'calls':>7} {'total s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+        for row in self.summarize():
+            lines.append(f"{row['stage']:<28} {row['calls']:>7} {row['total_s']:>9.2f} "
+                         f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}")
+        for name, amount in sorted(self.counters.items()):
+            lines.append(f"{name:<28} {amount:>7}")
+        return "\n".join(lines)
+
+    def close(self):
+        """Flush and close the trace file (tracing stays enabled for summaries)"""
+        with self._lock:
+            if self._trace_file is not None:
+                if self.counters:
+                    self._pending.append({"counters": dict(self.counters)})
+                self._flush()
+                self._trace_file.close()
+                self._trace_file = None
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def traced(stage: str) -> Callable:
+    """Decorator timing every call of a function as stage.<function name>"""
+    def decorate(func):
+        name = func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(stage, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# Process-wide tracer used by all generators
+tracer = Tracer()
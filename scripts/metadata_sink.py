@@ -0,0 +1,203 @@
+"""
+Buffered metadata writer for the collection generators
+
+Token metadata is serialized compactly on the render thread (so callers get
+the exact bytes to hash), then handed to a background thread that appends
+it in batches to one NDJSON collection file and, optionally, writes the
+per-token {id}.json files. The per-token files can also be produced later
+from the NDJSON with emit_token_files (or `python metadata_sink.py`).
+"""
+
+import argparse
+import json
+import os
+import queue
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from instrumentation import tracer
+
+# Items per background flush
+DEFAULT_BATCH_SIZE = 64
+
+
+def compact_json(metadata: Dict[str, Any]) -> bytes:
+    """Serialize metadata without indentation whitespace"""
+    return json.dumps(metadata, separators=(",", ":")).encode("utf-8")
+
+
+class MetadataSink:
+    """Background writer of token metadata to an NDJSON file and per-token JSON files
+
+    Lines are journaled as they are flushed. With resume=True an existing
+    collection file is kept, and close() compacts it to one line per token in
+    token order (later lines win), mirroring the run manifest.
+    """
+
+    def __init__(self, directory: str = "generated_nfts/metadata",
+                 ndjson_path: Optional[str] = "generated_nfts/metadata.ndjson",
+                 token_files: bool = True, resume: bool = False,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.directory = directory
+        self.ndjson_path = ndjson_path
+        self.token_files = token_files
+        self.batch_size = batch_size
+        self.written = 0
+        self.batches = 0
+
+        self._lines: Dict[int, bytes] = {}
+        self._queue = queue.Queue(maxsize=batch_size * 4)
+        self._error = None
+
+        if token_files:
+            os.makedirs(directory, exist_ok=True)
+
+        self._journal = None
+        if ndjson_path is not None:
+            os.makedirs(os.path.dirname(ndjson_path) or ".", exist_ok=True)
+            if resume:
+                self._lines.update(_read_ndjson(ndjson_path))
+            self._journal = open(ndjson_path, "ab" if resume else "wb")
+
+        self._thread = threading.Thread(target=self._run, name="metadata-sink", daemon=True)
+        self._thread.start()
+
+    def path_for(self, token_id: int) -> str:
+        """Per-token metadata file path"""
+        return os.path.join(self.directory, f"{token_id}.json")
+
+    def write(self, token_id: int, metadata: Dict[str, Any]) -> Tuple[str, bytes]:
+        """Queue a token's metadata; returns its file path and the exact bytes written"""
+        if self._error is not None:
+            raise self._error
+
+        data = compact_json(metadata)
+        self._queue.put((token_id, data))
+        return self.path_for(token_id), data
+
+    def flush(self):
+        """Block until everything queued so far is on disk"""
+        self._queue.join()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        """Flush, stop the writer thread and compact the NDJSON file"""
+        self._queue.put(None)
+        self._thread.join()
+
+        if self._journal is not None:
+            self._journal.close()
+            self._rewrite()
+
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+
+            batch = [item]
+            stop = False
+            # Drain whatever else is waiting, up to one batch
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            try:
+                if self._error is None:
+                    with tracer.span("write", "metadata_batch"):
+                        self._write_batch(batch)
+            except OSError as e:
+                self._error = e
+            finally:
+                for _ in range(len(batch) + stop):
+                    self._queue.task_done()
+
+            if stop:
+                return
+
+    def _write_batch(self, batch):
+        if self._journal is not None:
+            self._journal.write(b"".join(data + b"\n" for _, data in batch))
+            self._journal.flush()
+
+        for token_id, data in batch:
+            self._lines[token_id] = data
+            if self.token_files:
+                tmp_path = self.path_for(token_id) + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, self.path_for(token_id))
+
+        self.written += len(batch)
+        self.batches += 1
+
+    def _rewrite(self):
+        tmp_path = f"{self.ndjson_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for token_id in sorted(self._lines):
+                f.write(self._lines[token_id] + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.ndjson_path)
+
+
+def _read_ndjson(path: str) -> Dict[int, bytes]:
+    lines = {}
+    for token_id, line in iter_ndjson(path):
+        lines[token_id] = line
+    return lines
+
+
+def iter_ndjson(path: str) -> Iterator[Tuple[int, bytes]]:
+    """Yield (token id, raw JSON bytes) for each complete line of a collection file"""
+    if not os.path.exists(path):
+        return
+
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.rstrip(b"\n")
+            try:
+                metadata = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn write from an interrupted run
+            if isinstance(metadata, dict) and "tokenId" in metadata:
+                yield metadata["tokenId"], line
+
+
+def emit_token_files(ndjson_path: str, directory: str, indent: Optional[int] = None) -> int:
+    """Write {id}.json files from a collection NDJSON file; returns the number written"""
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+
+    for token_id, line in _read_ndjson(ndjson_path).items():
+        data = line if indent is None else json.dumps(json.loads(line), indent=indent).encode("utf-8")
+        with open(os.path.join(directory, f"{token_id}.json"), "wb") as f:
+            f.write(data)
+        count += 1
+
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write per-token metadata files from a collection NDJSON file")
+    parser.add_argument("ndjson", nargs="?", default="generated_nfts/metadata.ndjson",
+                        help="collection metadata file (default: generated_nfts/metadata.ndjson)")
+    parser.add_argument("--out", default="generated_nfts/metadata",
+                        help="output directory for {id}.json files (default: generated_nfts/metadata)")
+    parser.add_argument("--indent", type=int, default=None,
+                        help="pretty-print with this indent instead of compact JSON")
+    args = parser.parse_args()
+
+    written = emit_token_files(args.ndjson, args.out, args.indent)
+    print(f"Wrote {written} metadata files to {args.out}")
@@ -0,0 +1,230 @@
+"""
+Streaming render -> encode -> write pipeline with bounded queues
+
+A source iterator (usually the render stage, local or in a process pool)
+feeds a chain of thread stages through bounded queues, so a slow stage
+blocks the ones before it instead of letting rendered images pile up in
+memory. Stages with several workers run items concurrently (Pillow's
+encoders release the GIL); single-worker stages, and the results yielded to
+the caller, always see items in source order.
+
+Each stage records items processed, busy time and the depth of its input
+queue so the number of workers per stage can be sized for the machine.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# End-of-stream marker passed down the queues
+_STOP = object()
+
+
+class _Failure:
+    """An exception raised while processing an item, carried to the consumer"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class StageStats:
+    """Counters for one pipeline stage"""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.items += 1
+            self.busy_seconds += seconds
+
+    def sample_queue(self, depth: int):
+        with self._lock:
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+            self._depth_total += depth
+            self._depth_samples += 1
+
+    def summary(self, wall_seconds: float) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            # Items per second of stage busy time, per worker
+            "items_per_second": round(self.items / self.busy_seconds, 2) if self.busy_seconds else 0.0,
+            # Share of wall time the stage's workers were busy
+            "utilization": round(self.busy_seconds / (wall_seconds * self.workers), 3) if wall_seconds else 0.0,
+            "avg_queue_depth": round(self._depth_total / self._depth_samples, 2) if self._depth_samples else 0.0,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+class StagedPipeline:
+    """Run items from a source through thread stages connected by bounded queues
+
+    stages is a list of (name, fn, workers); fn takes the previous stage's
+    output and returns this stage's output.
+    """
+
+    def __init__(self, stages: List[Tuple[str, Callable[[Any], Any], int]],
+                 queue_size: int = 8, source_name: str = "render"):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.source_stats = StageStats(source_name, 1)
+        self.stage_stats = [StageStats(name, workers) for name, _, workers in stages]
+        self._started = None
+        self._finished = None
+
+    def run(self, source: Iterable[Any]) -> Iterator[Any]:
+        """Yield each source item's final output, in source order"""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(iter(source), queues[0]),
+                                    name="pipeline-source", daemon=True)]
+
+        for index, (name, fn, workers) in enumerate(self.stages):
+            remaining = [workers]
+            lock = threading.Lock()
+            # Single-worker stages see items in order (writers, manifests)
+            ordered = {"next": 0, "pending": {}} if workers == 1 else None
+            for worker in range(workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(fn, self.stage_stats[index], queues[index], queues[index + 1], remaining, lock, ordered),
+                    name=f"pipeline-{name}-{worker}", daemon=True))
+
+        self._started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        next_seq = 0
+        pending = {}
+        output = queues[-1]
+        while True:
+            item = output.get()
+            if item is _STOP:
+                break
+            seq, value = item
+            pending[seq] = value
+            while next_seq in pending:
+                value = pending.pop(next_seq)
+                next_seq += 1
+                if isinstance(value, _Failure):
+                    raise value.error
+                yield value
+        self._finished = time.perf_counter()
+
+    @property
+    def wall_seconds(self) -> float:
+        """Time since the pipeline started (until the stream ended)"""
+        if self._started is None:
+            return 0.0
+        return (self._finished or time.perf_counter()) - self._started
+
+    def _put(self, out: queue.Queue, item: Any, stats: Optional[StageStats]):
+        out.put(item)
+        if stats is not None:
+            stats.sample_queue(out.qsize())
+
+    def _feed(self, source: Iterator[Any], out: queue.Queue):
+        stats = self.stage_stats[0] if self.stage_stats else None
+        seq = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(source)
+            except StopIteration:
+                break
+            except BaseException as e:
+                self._put(out, (seq, _Failure(e)), stats)
+                break
+            self.source_stats.add(time.perf_counter() - started)
+            self._put(out, (seq, item), stats)
+            seq += 1
+        out.put(_STOP)
+
+    def _work(self, fn: Callable[[Any], Any], stats: StageStats, inbox: queue.Queue, out: queue.Queue,
+              remaining: List[int], lock: threading.Lock, ordered: Optional[Dict[str, Any]]):
+        downstream = self._downstream_stats(stats)
+        backlog = deque()
+
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                # Let sibling workers see the end of the stream too
+                inbox.put(_STOP)
+                break
+
+            if ordered is None:
+                backlog.append(item)
+            else:
+                ordered["pending"][item[0]] = item[1]
+                while ordered["next"] in ordered["pending"]:
+                    backlog.append((ordered["next"], ordered["pending"].pop(ordered["next"])))
+                    ordered["next"] += 1
+
+            while backlog:
+                seq, value = backlog.popleft()
+                if not isinstance(value, _Failure):
+                    started = time.perf_counter()
+                    try:
+                        value = fn(value)
+                    except BaseException as e:
+                        value = _Failure(e)
+                    stats.add(time.perf_counter() - started)
+                self._put(out, (seq, value), downstream)
+
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            out.put(_STOP)
+
+    def _downstream_stats(self, stats: StageStats) -> Optional[StageStats]:
+        index = self.stage_stats.index(stats)
+        return self.stage_stats[index + 1] if index + 1 < len(self.stage_stats) else None
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Per-stage throughput, utilization and input queue depth"""
+        return [stats.summary(self.wall_seconds) for stats in [self.source_stats] + self.stage_stats]
+
+    def format_summary(self) -> str:
+        """Human-readable stage table"""
+        lines = [f"{'stage':<10} {'workers':>7} {'items':>6} {'busy s':>8} {'items/s':>8} "
+                 f"{'util':>6} {'avg q':>6} {'max q':>6}"]
+        for row in self.summary():
+            lines.append(f"{row['stage']:<10} {row['workers']:>7} {row['items']:>6} {row['busy_seconds']:>8.1f} "
+                         f"{row['items_per_second']:>8.1f} {row['utilization']:>6.0%} "
+                         f"{row['avg_queue_depth']:>6.1f} {row['max_queue_depth']:>6}")
+        return "\n".join(lines)
+
+
+def bounded_imap(pool, fn: Callable[[Any], Any], items: Iterable[Any], window: int) -> Iterator[Any]:
+    """Ordered pool.imap that keeps at most window tasks in flight
+
+    Pool.imap submits every item up front, so with a slow consumer finished
+    results (whole rendered images) accumulate without bound. Here a new
+    task is only submitted when a result is taken.
+    """
+    in_flight = deque()
+    items = iter(items)
+
+    for item in items:
+        in_flight.append(pool.apply_async(fn, (item,)))
+        if len(in_flight) >= window:
+            break
+
+    while in_flight:
+        result = in_flight.popleft().get()
+        for item in items:
+            in_flight.append(pool.apply_async(fn, (item,)))
+            break
+        yield result
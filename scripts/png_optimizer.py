@@ -0,0 +1,229 @@
+"""
+Lossless PNG size reductions
+
+pack_palette() remaps a palette image to only the entries it uses, so the
+PNG writer picks the smallest legal bit depth (1/2/4/8 bits for up to
+2/4/16/256 colors). Entries with alpha come first, so the tRNS chunk ends
+at the last translucent entry and is left out when every used color is
+opaque.
+
+Pillow writes PNGs with one filter choice and zlib's default strategy. For
+our small palette images a different per-scanline filter or deflate
+strategy is often a few percent smaller, which can decide whether a token
+fits its byte target without a lossy or resized fallback.
+
+optimize_png() takes an encoded PNG, re-packs its scanlines at the same bit
+depth and color type, applies each filter strategy (the five PNG filters on
+every row, plus the per-row minimum-sum heuristic libpng uses) and deflates
+every variant with each zlib strategy. The deflate runs happen in a shared
+thread pool (zlib releases the GIL). The smallest stream replaces the IDAT
+data; all other chunks are kept as they are. The result is decoded and
+checked against the input pixels before it is used, and the original is
+kept whenever nothing is smaller.
+
+Interlaced and 16-bit PNGs are returned unchanged.
+"""
+
+import io
+import os
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from instrumentation import tracer
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+FILTERS = ("none", "sub", "up", "average", "paeth", "minsum")
+
+ZLIB_STRATEGIES = {
+    "default": zlib.Z_DEFAULT_STRATEGY,
+    "filtered": zlib.Z_FILTERED,
+    "rle": zlib.Z_RLE,
+    "huffman": zlib.Z_HUFFMAN_ONLY,
+}
+
+# (color type, bit depth) -> Pillow raw mode packing scanlines the way the PNG stores them
+RAW_MODES = {
+    (3, 1): "P;1", (3, 2): "P;2", (3, 4): "P;4", (3, 8): "P",
+    (0, 8): "L", (2, 8): "RGB", (4, 8): "LA", (6, 8): "RGBA",
+}
+CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# Shared by every caller in the process; deflate runs are short and independent
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="png-optimize")
+        return _executor
+
+
+def pack_palette(img: Image.Image) -> Image.Image:
+    """Palette image trimmed to the entries its pixels use; other modes are returned as is
+
+    Pixels keep their exact colors and alpha. Translucent entries are
+    placed first, then the opaque ones in their original order.
+    """
+    if img.mode != "P":
+        return img
+
+    counts = img.histogram()
+    used = [index for index, count in enumerate(counts) if count]
+    entries = palette_entries(img)
+    alpha = entries[:, 3].tolist()
+
+    order = sorted(used, key=lambda index: alpha[index] == 255)
+    lookup = np.zeros(256, dtype=np.uint8)
+    lookup[order] = np.arange(len(order), dtype=np.uint8)
+
+    packed = Image.fromarray(lookup[np.asarray(img)], "P")
+    packed.putpalette(entries[order, :3].tobytes())
+    translucent = [alpha[index] for index in order if alpha[index] < 255]
+    if translucent:
+        packed.info["transparency"] = bytes(translucent)
+    return packed
+
+
+def palette_entries(img: Image.Image) -> np.ndarray:
+    """(256, 4) uint8 RGBA palette of a palette image, alpha taken from tRNS if present"""
+    rgba = img.getpalette("RGBA") or []
+    entries = np.zeros((256, 4), dtype=np.uint8)
+    entries.reshape(-1)[:len(rgba)] = rgba
+    transparency = img.info.get("transparency")
+    if isinstance(transparency, int):
+        entries[:, 3] = 255
+        entries[transparency, 3] = 0
+    elif isinstance(transparency, bytes):
+        entries[:, 3] = 255
+        entries[:len(transparency), 3] = np.frombuffer(transparency, dtype=np.uint8)
+    elif img.palette is None or img.palette.mode != "RGBA":
+        entries[:, 3] = 255
+    return entries
+
+
+def read_chunks(data: bytes) -> List[Tuple[bytes, bytes]]:
+    """(type, body) of every chunk in a PNG stream"""
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("not a PNG stream")
+    chunks = []
+    offset = len(PNG_SIGNATURE)
+    while offset < len(data):
+        length, kind = struct.unpack(">I4s", data[offset:offset + 8])
+        chunks.append((kind, data[offset + 8:offset + 8 + length]))
+        offset += 12 + length
+    return chunks
+
+
+def write_chunk(kind: bytes, body: bytes) -> bytes:
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+
+def filter_scanlines(rows: np.ndarray, bpp: int) -> Dict[str, np.ndarray]:
+    """Filtered image data (filter byte + row) for each strategy in FILTERS
+
+    rows is (height, stride) uint8 raw scanlines; bpp is the filter's byte
+    distance (bytes per complete pixel, at least 1).
+    """
+    raw = rows.astype(np.int16)
+    left = np.zeros_like(raw)
+    left[:, bpp:] = raw[:, :-bpp]
+    up = np.zeros_like(raw)
+    up[1:] = raw[:-1]
+    up_left = np.zeros_like(raw)
+    up_left[1:, bpp:] = raw[:-1, :-bpp]
+
+    # Paeth predictor: whichever of left, up, up-left is closest to left + up - up-left
+    estimate = left + up - up_left
+    distance_left = np.abs(estimate - left)
+    distance_up = np.abs(estimate - up)
+    distance_up_left = np.abs(estimate - up_left)
+    paeth = np.where((distance_left <= distance_up) & (distance_left <= distance_up_left), left,
+                     np.where(distance_up <= distance_up_left, up, up_left))
+
+    residuals = np.stack([raw, raw - left, raw - up, raw - ((left + up) >> 1), raw - paeth]).astype(np.uint8)
+
+    variants = {}
+    for filter_type, name in enumerate(FILTERS[:5]):
+        variants[name] = _with_filter_bytes(residuals[filter_type], np.full(len(rows), filter_type, np.uint8))
+
+    # Per row, the filter with the smallest sum of residuals taken as signed bytes
+    cost = np.abs(residuals.view(np.int8).astype(np.int32)).sum(axis=2)
+    choice = cost.argmin(axis=0)
+    variants["minsum"] = _with_filter_bytes(residuals[choice, np.arange(len(rows))], choice.astype(np.uint8))
+    return variants
+
+
+def _with_filter_bytes(residuals: np.ndarray, filter_types: np.ndarray) -> np.ndarray:
+    return np.concatenate([filter_types[:, None], residuals], axis=1)
+
+
+def _deflate(filtered: bytes, strategy: int) -> Tuple[bytes, float]:
+    started = time.thread_time()
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+    stream = compressor.compress(filtered) + compressor.flush()
+    return stream, time.thread_time() - started
+
+
+def optimize_png(data: bytes) -> Dict[str, Any]:
+    """Smallest valid re-compression of a PNG stream
+
+    Returns "data" (the input if nothing was smaller), "saved_bytes",
+    "cpu_s" (CPU time over all threads), the winning "filter" and
+    "strategy" (None when the input was kept) and the number of
+    "candidates" tried. Saved bytes are added to the "png.saved_bytes"
+    counter.
+    """
+    started = time.thread_time()
+    result = {"data": data, "saved_bytes": 0, "cpu_s": 0.0, "filter": None, "strategy": None, "candidates": 0}
+
+    with tracer.span("png_optimize"):
+        chunks = read_chunks(data)
+        width, height, bit_depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", chunks[0][1])
+        raw_mode = RAW_MODES.get((color_type, bit_depth))
+        if raw_mode is None or interlace:
+            result["cpu_s"] = time.thread_time() - started
+            return result
+
+        img = Image.open(io.BytesIO(data))
+        pixels = img.tobytes()
+        stride = (width * bit_depth * CHANNELS[color_type] + 7) // 8
+        rows = np.frombuffer(img.tobytes("raw", raw_mode), dtype=np.uint8).reshape(height, stride)
+        bpp = max(1, bit_depth * CHANNELS[color_type] // 8)
+
+        variants = [(name, filtered.tobytes()) for name, filtered in filter_scanlines(rows, bpp).items()]
+        jobs = [(name, strategy_name, _pool().submit(_deflate, filtered, strategy))
+                for name, filtered in variants for strategy_name, strategy in ZLIB_STRATEGIES.items()]
+        result["candidates"] = len(jobs)
+
+        deflate_cpu = 0.0
+        best = None
+        for name, strategy_name, job in jobs:
+            stream, cpu = job.result()
+            deflate_cpu += cpu
+            if best is None or len(stream) < len(best[2]):
+                best = (name, strategy_name, stream)
+
+        # Everything but the image data is kept; the stream goes into a single IDAT
+        body = [write_chunk(kind, chunk) for kind, chunk in chunks if kind not in (b"IDAT", b"IEND")]
+        candidate = PNG_SIGNATURE + b"".join(body) + write_chunk(b"IDAT", best[2]) + write_chunk(b"IEND", b"")
+
+        if len(candidate) < len(data):
+            decoded = Image.open(io.BytesIO(candidate))
+            if decoded.mode == img.mode and decoded.size == img.size and decoded.tobytes() == pixels:
+                result.update(data=candidate, saved_bytes=len(data) - len(candidate),
+                              filter=best[0], strategy=best[1])
+
+        result["cpu_s"] = time.thread_time() - started + deflate_cpu
+    tracer.count("png.saved_bytes", result["saved_bytes"])
+    return result
@@ -0,0 +1,194 @@
+"""
+Optional Numba-compiled backend for the scanline rasterizer
+
+The geometry is already expanded level by level in NumPy (fractal_geometry);
+what is left per token is painting tens of thousands of primitives. Here
+each primitive is scan-converted and blended by plain loops in paint order,
+which Numba compiles to machine code: no span/fragment arrays, sorts or
+per-rank passes as in the vectorized rasterize_scanline.
+
+Numba is optional. Without it rasterize_jit falls back to
+rasterize_scanline, which produces the same pixels: both premultiply,
+blend and unpremultiply with the same float32 operations in the same
+order. The kernel can also run as plain Python (fallback=False), which is
+slow but lets verify-render-backends.py check that equivalence on machines
+without Numba.
+"""
+
+import numpy as np
+from PIL import Image
+
+from canvas_pool import canvas_pool
+from fractal_geometry import ELLIPSE, LINE, PrimitiveBuffer
+from instrumentation import tracer
+from scanline import rasterize_scanline
+
+try:
+    import numba
+except ImportError:  # optional dependency
+    numba = None
+
+JIT_AVAILABLE = numba is not None
+
+
+def _compile(func):
+    return numba.njit(cache=True, nogil=True)(func) if JIT_AVAILABLE else func
+
+
+@_compile
+def _blend_span(pixels, blended, touched, row, first_column, end_column, color, keep, width):
+    scale = np.float32(255)
+    base = row * width
+    for column in range(first_column, end_column):
+        pixel = base + column
+        if not touched[pixel]:
+            touched[pixel] = True
+            alpha = np.float32(pixels[pixel, 3])
+            opacity = alpha / scale
+            for channel in range(3):
+                blended[pixel, channel] = np.float32(pixels[pixel, channel]) * opacity
+            blended[pixel, 3] = alpha
+        for channel in range(4):
+            blended[pixel, channel] = blended[pixel, channel] * keep + color[channel]
+
+
+@_compile
+def _span_columns(x_start, x_end, width):
+    first_column = min(max(np.ceil(x_start - 0.5), 0.0), float(width))
+    end_column = min(max(np.ceil(x_end - 0.5), 0.0), float(width))
+    return int(first_column), int(end_column)
+
+
+@_compile
+def _fill_ellipse(pixels, blended, touched, box, color, keep, width, height):
+    center_x = (box[0] + box[2]) / 2
+    center_y = (box[1] + box[3]) / 2
+    radius_x = abs(box[2] - box[0]) / 2
+    radius_y = abs(box[3] - box[1]) / 2
+    if radius_y <= 0:
+        return
+    first_row = int(max(np.ceil(center_y - radius_y - 0.5), 0.0))
+    end_row = int(min(np.ceil(center_y + radius_y - 0.5), float(height)))
+    for row in range(first_row, end_row):
+        dy = (row + 0.5 - center_y) / radius_y
+        half = radius_x * np.sqrt(max(0.0, 1 - dy * dy))
+        first_column, end_column = _span_columns(center_x - half, center_x + half, width)
+        _blend_span(pixels, blended, touched, row, first_column, end_column, color, keep, width)
+
+
+@_compile
+def _fill_polygon(pixels, blended, touched, points, color, keep, width, height):
+    count = points.shape[0]
+    first_rows = np.empty(count, dtype=np.int64)
+    end_rows = np.empty(count, dtype=np.int64)
+    crossings = 0
+    for edge in range(count):
+        y0 = points[edge, 1]
+        y1 = points[(edge + 1) % count, 1]
+        first_rows[edge] = int(max(np.ceil(min(y0, y1) - 0.5), 0.0))
+        end_rows[edge] = int(min(np.ceil(max(y0, y1) - 0.5), float(height)))
+        crossings += max(end_rows[edge] - first_rows[edge], 0)
+    if crossings == 0:
+        return
+
+    # Edge crossings at pixel-center rows, ordered by row then x
+    rows = np.empty(crossings, dtype=np.int64)
+    xs = np.empty(crossings, dtype=np.float64)
+    index = 0
+    for edge in range(count):
+        x0, y0 = points[edge, 0], points[edge, 1]
+        x1, y1 = points[(edge + 1) % count, 0], points[(edge + 1) % count, 1]
+        for row in range(first_rows[edge], end_rows[edge]):
+            t = (row + 0.5 - y0) / (y1 - y0)
+            rows[index] = row
+            xs[index] = x0 + t * (x1 - x0)
+            index += 1
+    order = np.argsort(xs, kind="mergesort")
+    order = order[np.argsort(rows[order], kind="mergesort")]
+
+    # Consecutive pairs are inside (even-odd)
+    for pair in range(0, crossings, 2):
+        start, end = order[pair], order[pair + 1]
+        first_column, end_column = _span_columns(xs[start], xs[end], width)
+        _blend_span(pixels, blended, touched, rows[start], first_column, end_column, color, keep, width)
+
+
+@_compile
+def composite_buffer(pixels, kinds, coords, starts, counts, widths, colors, transparency, width, height,
+                     blended, touched):
+    """Rasterize and blend primitives source-over, in paint order, into (H * W, 4) uint8 pixels in place
+
+    Arrays are PrimitiveBuffer.finalize() output; colors is (P, 4)
+    premultiplied float32 with alpha on the 0-255 scale and transparency
+    (P,) is 1 - alpha / 255. Only covered pixels are converted to float and
+    written back. Shapes are sampled at pixel centers exactly like
+    scanline.buffer_spans.
+
+    blended ((H * W, 4) float32) and touched ((H * W,) bool, all False) are
+    scratch; a pixel's blended row is initialized when it is first touched,
+    and touched is all False again on return.
+    """
+    scale = np.float32(255)
+
+    for primitive in range(kinds.shape[0]):
+        points = coords[starts[primitive]:starts[primitive] + counts[primitive]]
+        color = colors[primitive]
+        keep = transparency[primitive]
+        if kinds[primitive] == ELLIPSE:
+            _fill_ellipse(pixels, blended, touched, points.ravel(), color, keep, width, height)
+            continue
+        if kinds[primitive] == LINE:
+            # Same quad as scanline._line_quads
+            dx = points[1, 0] - points[0, 0]
+            dy = points[1, 1] - points[0, 1]
+            length = np.hypot(dx, dy)
+            if length == 0:
+                length = 1.0
+            half = widths[primitive] / 2.0
+            normal_x = -dy / length * half
+            normal_y = dx / length * half
+            quad = np.empty((4, 2), dtype=np.float64)
+            quad[0, 0], quad[0, 1] = points[0, 0] + normal_x, points[0, 1] + normal_y
+            quad[1, 0], quad[1, 1] = points[1, 0] + normal_x, points[1, 1] + normal_y
+            quad[2, 0], quad[2, 1] = points[1, 0] - normal_x, points[1, 1] - normal_y
+            quad[3, 0], quad[3, 1] = points[0, 0] - normal_x, points[0, 1] - normal_y
+            points = quad
+        _fill_polygon(pixels, blended, touched, points, color, keep, width, height)
+
+    for pixel in range(pixels.shape[0]):
+        if not touched[pixel]:
+            continue
+        touched[pixel] = False
+        alpha = blended[pixel, 3]
+        for channel in range(4):
+            value = blended[pixel, channel]
+            if channel < 3 and alpha > 0:
+                value = value * scale / alpha
+            pixels[pixel, channel] = np.uint8(min(max(np.rint(value), np.float32(0)), scale))
+
+
+def rasterize_jit(img: Image.Image, buffer: PrimitiveBuffer, fallback: bool = True) -> Image.Image:
+    """Composite a primitive buffer over an RGBA image with the compiled kernel
+
+    Without Numba this is rasterize_scanline (same pixels), or with
+    fallback=False the kernel interpreted as Python.
+    """
+    if not JIT_AVAILABLE and fallback:
+        return rasterize_scanline(img, buffer)
+
+    width, height = img.size
+    with tracer.span("rasterize", "jit" if JIT_AVAILABLE else "python"):
+        data = buffer.finalize()
+        colors = data["colors"].astype(np.float32)
+        transparency = 1 - colors[:, 3] / 255
+        colors[:, :3] *= (1 - transparency)[:, None]
+
+        pixels = np.array(img if img.mode == "RGBA" else img.convert("RGBA")).reshape(-1, 4)
+        # Scratch comes back from the kernel ready for the next token
+        blended = canvas_pool.acquire_array((len(pixels), 4), np.float32, clear=False)
+        touched = canvas_pool.acquire_array((len(pixels),), np.bool_, clear=False)
+        composite_buffer(pixels, data["kinds"], data["coords"], data["starts"], data["counts"],
+                         data["widths"], colors, transparency, width, height, blended, touched)
+        canvas_pool.release(blended)
+        canvas_pool.release(touched)
+    return Image.fromarray(pixels.reshape(height, width, 4), "RGBA")
@@ -4,7 +4,6 @@ Ultra-optimized NFT generation script targeting 8KB file sizes
 Maintains artistic quality while achieving maximum compression
 """
 
-import numpy as np
 from PIL import Image, ImageDraw, ImageFilter, ImageEnhance, ImageOps
 import colorsys
 import math
@@ -13,6 +12,24 @@ import os
 import io
 from typing import Dict, List, Tuple, Any
 import time
+import argparse
+
+from seeding import COLLECTION_SEED, token_rng
+from run_manifest import RunManifest, bytes_sha256, params_hash
+from metadata_sink import MetadataSink
+from pipeline import StagedPipeline
+from encoders import write_atomic
+from content_store import ContentStore
+import png_optimizer
+from resize_pyramid import ResizePyramid
+from instrumentation import tracer, traced
+from canvas_pool import canvas_pool, reuse_pillow_blocks
+
+# Bump whenever rendering or encoding changes so --resume re-renders tokens
+RENDER_VERSION = 4
+
+# Color budget of a token image; indexed rendering reserves index 0 for the transparent background
+MAX_COLORS = 16
 
 GEOLOGIC_ERAS = {
     "precambrian": {
@@ -60,14 +77,22 @@ GEOLOGIC_ERAS = {
 }
 
 class UltraOptimizedFractalGenerator:
-    def __init__(self, width=512, height=512):
+    def __init__(self, width=512, height=512, collection_seed=COLLECTION_SEED, indexed=True,
+                 optimize_png=False):
         self.width = width
         self.height = height
         self.center_x = width // 2
         self.center_y = height // 2
+        self.collection_seed = collection_seed
+        # Draw palette indices straight into a 'P' canvas instead of quantizing an RGBA render
+        self.indexed = indexed
+        # Encoding brute-forces PNG filters and zlib settings (can change the winning strategy)
+        self.optimize_png = optimize_png
+        # (era colors, max colors) -> (palette, RGBA palette bytes with transparent index 0)
+        self._era_palettes = {}
         
-    def generate_organism_fractal(self, token_id: int) -> Dict[str, Any]:
-        """Generate ultra-optimized fractal organism"""
+    def sample_parameters(self, token_id: int) -> Dict[str, Any]:
+        """Sample the deterministic generation parameters for a token"""
         # Determine era and organism
         era_names = list(GEOLOGIC_ERAS.keys())
         organisms_per_era = 4444 // len(era_names)
@@ -75,17 +100,54 @@ class UltraOptimizedFractalGenerator:
         era_name = era_names[era_index]
         era_data = GEOLOGIC_ERAS[era_name]
         
-        # Deterministic generation
-        np.random.seed(token_id)
+        # Deterministic generation from this token's own RNG stream
+        rng = token_rng(token_id, "params", self.collection_seed)
         
         organism_name = era_data["organisms"][token_id % len(era_data["organisms"])]
         
         # Optimized parameters for smaller file sizes
-        fractal_depth = np.random.randint(3, 6)  # Reduced depth
-        complexity = 0.4 + np.random.random() * 0.4  # Reduced complexity
-        color_variant = np.random.randint(0, len(era_data["colors"]))
-        rotation_factor = np.random.random() * 2 * math.pi
-        scale_factor = 0.7 + np.random.random() * 0.3  # Smaller scale
+        fractal_depth = int(rng.integers(3, 6))  # Reduced depth
+        complexity = 0.4 + rng.random() * 0.4  # Reduced complexity
+        color_variant = int(rng.integers(0, len(era_data["colors"])))
+        rotation_factor = rng.random() * 2 * math.pi
+        scale_factor = 0.7 + rng.random() * 0.3  # Smaller scale
+        
+        return {
+            "era_name": era_name,
+            "organism_name": organism_name,
+            "fractal_depth": fractal_depth,
+            "complexity": complexity,
+            "color_variant": color_variant,
+            "rotation_factor": rotation_factor,
+            "scale_factor": scale_factor
+        }
+    
+    def params_hash(self, token_id: int) -> str:
+        """Hash of everything that determines a token's pixels and encoding"""
+        return params_hash({
+            "generator": "run-optimization",
+            "renderVersion": RENDER_VERSION,
+            "tokenId": token_id,
+            "width": self.width,
+            "height": self.height,
+            "collectionSeed": self.collection_seed,
+            "indexed": self.indexed,
+            "optimizePng": self.optimize_png,
+            "params": self.sample_parameters(token_id)
+        })
+    
+    def generate_organism_fractal(self, token_id: int) -> Dict[str, Any]:
+        """Generate ultra-optimized fractal organism"""
+        with tracer.span("params"):
+            params = self.sample_parameters(token_id)
+        era_name = params["era_name"]
+        era_data = GEOLOGIC_ERAS[era_name]
+        organism_name = params["organism_name"]
+        fractal_depth = params["fractal_depth"]
+        complexity = params["complexity"]
+        color_variant = params["color_variant"]
+        rotation_factor = params["rotation_factor"]
+        scale_factor = params["scale_factor"]
         
         # Create optimized image
         img = self.create_ultra_optimized_fractal(
@@ -117,27 +179,27 @@ class UltraOptimizedFractalGenerator:
     def create_ultra_optimized_fractal(self, organism_name: str, era_colors: List[str], 
                                      depth: int, complexity: float, color_variant: int,
                                      rotation_factor: float, scale_factor: float, token_id: int) -> Image.Image:
-        """Create ultra-optimized fractal with minimal colors and maximum compression"""
+        """Create ultra-optimized fractal with minimal colors and maximum compression
         
-        # Start with indexed color mode for smaller files
-        img = Image.new('P', (self.width, self.height))
+        Indexed rendering draws palette indices into a 'P' canvas carrying the
+        cached era palette, so nothing is quantized per token.
+        """
         
-        # Create optimized palette (max 16 colors)
-        rgb_colors = [self.hex_to_rgb(color) for color in era_colors]
-        optimized_palette = self.create_optimized_palette(rgb_colors, 16)
-        
-        # Set palette
-        palette_data = []
-        for color in optimized_palette:
-            palette_data.extend(color)
-        # Pad to 256 colors
-        while len(palette_data) < 768:
-            palette_data.extend([0, 0, 0])
+        if self.indexed:
+            optimized_palette, palette_data = self.era_palette(era_colors, MAX_COLORS - 1)
+            img = canvas_pool.acquire('P', (self.width, self.height), 0)
+            img.putpalette(palette_data, "RGBA")
+            
+            # Palette entry i + 1 holds optimized_palette[i]
+            indices = list(range(1, len(optimized_palette) + 1))
+            self.draw_optimized_fractal_pattern(ImageDraw.Draw(img), indices, organism_name,
+                                                depth, complexity, rotation_factor, scale_factor)
+            return img
         
-        img.putpalette(palette_data)
+        optimized_palette, _ = self.era_palette(era_colors, MAX_COLORS)
         
-        # Create temporary RGBA for drawing
-        temp_img = Image.new('RGBA', (self.width, self.height), (0, 0, 0, 0))
+        # Draw on a cleared RGBA canvas from the pool; quantize builds the indexed image
+        temp_img = canvas_pool.acquire('RGBA', (self.width, self.height), (0, 0, 0, 0))
         draw = ImageDraw.Draw(temp_img)
         
         # Draw simplified fractal patterns
@@ -145,7 +207,9 @@ class UltraOptimizedFractalGenerator:
                                           depth, complexity, rotation_factor, scale_factor)
         
         # Convert to palette mode
-        quantized = temp_img.quantize(colors=16, method=Image.Quantize.MEDIANCUT)
+        with tracer.span("quantize"):
+            quantized = temp_img.quantize(colors=MAX_COLORS, method=Image.Quantize.FASTOCTREE)  # MEDIANCUT rejects RGBA
+        canvas_pool.release(temp_img)
         
         return quantized
     
@@ -154,12 +218,24 @@ class UltraOptimizedFractalGenerator:
         hex_color = hex_color.lstrip('#')
         return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
     
+    def era_palette(self, era_colors: List[str], max_colors: int) -> Tuple[List[Tuple[int, int, int]], bytes]:
+        """Cached optimized palette of an era and its RGBA palette bytes (index 0 transparent, then the palette)"""
+        key = (tuple(era_colors), max_colors)
+        cached = self._era_palettes.get(key)
+        if cached is None:
+            palette = self.create_optimized_palette([self.hex_to_rgb(color) for color in era_colors], max_colors)
+            palette_data = bytes([0, 0, 0, 0]) + b"".join(bytes(color) + b"\xff" for color in palette)
+            cached = self._era_palettes[key] = (palette, palette_data)
+        return cached
+    
     def create_optimized_palette(self, colors: List[Tuple[int, int, int]], max_colors: int) -> List[Tuple[int, int, int]]:
         """Create optimized color palette"""
         if len(colors) <= max_colors:
             # Add gradients between colors
             palette = colors.copy()
-            while len(palette) < max_colors and len(colors) > 1:
+            grew = True
+            while len(palette) < max_colors and len(colors) > 1 and grew:
+                grew = False
                 for i in range(len(colors) - 1):
                     if len(palette) >= max_colors:
                         break
@@ -168,6 +244,7 @@ class UltraOptimizedFractalGenerator:
                     mid_color = tuple((c1[j] + c2[j]) // 2 for j in range(3))
                     if mid_color not in palette:
                         palette.append(mid_color)
+                        grew = True
             return palette[:max_colors]
         
         # Reduce colors using simple sampling
@@ -189,6 +266,7 @@ class UltraOptimizedFractalGenerator:
         else:
             self.draw_simple_radial(draw, colors, depth, complexity, rotation, scale)
     
+    @traced("draw")
     def draw_simple_bilateral(self, draw: ImageDraw.Draw, colors: List[Tuple[int, int, int]], 
                             depth: int, complexity: float, rotation: float, scale: float):
         """Simplified bilateral pattern"""
@@ -218,6 +296,7 @@ class UltraOptimizedFractalGenerator:
         draw_wing(self.center_x, self.center_y, base_size, depth, 1)
         draw_wing(self.center_x, self.center_y, base_size, depth, -1)
     
+    @traced("draw")
     def draw_simple_spiral(self, draw: ImageDraw.Draw, colors: List[Tuple[int, int, int]], 
                          depth: int, complexity: float, rotation: float, scale: float):
         """Simplified spiral pattern"""
@@ -243,6 +322,7 @@ class UltraOptimizedFractalGenerator:
                 draw.line([points[i], points[i+1], points[i+2], points[i+3]], 
                          fill=color, width=3)
     
+    @traced("draw")
     def draw_simple_segmented(self, draw: ImageDraw.Draw, colors: List[Tuple[int, int, int]], 
                             depth: int, complexity: float, rotation: float, scale: float):
         """Simplified segmented pattern"""
@@ -258,6 +338,7 @@ class UltraOptimizedFractalGenerator:
             
             draw.ellipse([x - size, y - size//2, x + size, y + size//2], fill=color)
     
+    @traced("draw")
     def draw_simple_radial(self, draw: ImageDraw.Draw, colors: List[Tuple[int, int, int]], 
                          depth: int, complexity: float, rotation: float, scale: float):
         """Simplified radial pattern"""
@@ -276,40 +357,142 @@ class UltraOptimizedFractalGenerator:
             draw.ellipse([end_x - base_size//2, end_y - base_size//2, 
                          end_x + base_size//2, end_y + base_size//2], fill=color)
 
-def save_ultra_compressed(img: Image.Image, filename: str, target_kb: int = 8) -> Dict[str, Any]:
-    """Save with ultra compression targeting specific file size"""
+def save_ultra_compressed(img: Image.Image, filename: str, target_kb: int = 8,
+                          optimize_png: bool = False, store: ContentStore = None) -> Dict[str, Any]:
+    """Save with ultra compression targeting specific file size
+    
+    Candidates are trimmed to the palette entries they use (so they are
+    written at the smallest bit depth), encoded into one in-memory buffer
+    and sized with len(); only the winner is written, atomically, to
+    filename or, given a content store, under its content key (once per
+    distinct image). Besides the compression summary the result carries the
+    "path" written, "size_bytes" and the bytes' SHA-256 "digest".
+    
+    With optimize_png every candidate is re-compressed with the best PNG
+    filter/zlib strategy (see png_optimizer.py) before its size is checked;
+    the result then also has "png_saved_bytes" (for the written candidate)
+    and "png_cpu_ms" (over all candidates).
+    """
     target_bytes = target_kb * 1024
+    # Reused by every strategy; each one either wins or is overwritten by the next
+    buffer = io.BytesIO()
+    search = {"saved": 0, "cpu_s": 0.0}
     
-    # Strategy 1: PNG with maximum compression
-    img.save(filename, "PNG", optimize=True, compress_level=9)
-    size = os.path.getsize(filename)
+    def encode(candidate: Image.Image, method: str) -> int:
+        buffer.seek(0)
+        buffer.truncate()
+        candidate = png_optimizer.pack_palette(candidate)
+        with tracer.span("encode", method):
+            candidate.save(buffer, "PNG", optimize=True, compress_level=9)
+        if optimize_png:
+            optimized = png_optimizer.optimize_png(buffer.getvalue())
+            search["saved"] = optimized["saved_bytes"]
+            search["cpu_s"] += optimized["cpu_s"]
+            if optimized["saved_bytes"]:
+                buffer.seek(0)
+                buffer.truncate()
+                buffer.write(optimized["data"])
+        return buffer.tell()
+    
+    def commit(method: str, size: int) -> Dict[str, Any]:
+        with buffer.getbuffer() as data:
+            if store is not None:
+                digest, path = store.put(data, "png")
+            else:
+                write_atomic(filename, data)
+                digest, path = bytes_sha256(data), filename
+        result = {"success": size <= target_bytes, "method": method, "size_kb": round(size/1024, 2),
+                  "path": path, "size_bytes": size, "digest": digest}
+        if optimize_png:
+            result["png_saved_bytes"] = search["saved"]
+            result["png_cpu_ms"] = round(search["cpu_s"] * 1000, 2)
+        return result
     
+    # Strategy 1: PNG with maximum compression
+    size = encode(img, "PNG")
     if size <= target_bytes:
-        return {"success": True, "method": "PNG", "size_kb": round(size/1024, 2)}
+        return commit("PNG", size)
     
-    # Strategy 2: Reduce colors further
+    # Strategy 2: Reduce colors further (an indexed render would encode to the same bytes again)
     if img.mode != 'P':
-        img = img.quantize(colors=8, method=Image.Quantize.MEDIANCUT)
+        with tracer.span("quantize", "8"):
+            img = img.quantize(colors=8, method=Image.Quantize.MEDIANCUT)
+        size = encode(img, "PNG-8")
+        if size <= target_bytes:
+            return commit("PNG-8", size)
     
-    img.save(filename, "PNG", optimize=True, compress_level=9)
-    size = os.path.getsize(filename)
+    # Strategy 3: Reduce dimensions, largest size first, every size taken from one pyramid
+    pyramid = ResizePyramid(img)
+    for scale, resized in pyramid.levels():
+        size = encode(resized, "PNG-Resized")
+        if size <= target_bytes:
+            break
     
-    if size <= target_bytes:
-        return {"success": True, "method": "PNG-8", "size_kb": round(size/1024, 2)}
+    return commit("PNG-Resized", size)
+
+def encode_optimized_token(rendered: Dict[str, Any], optimize_png: bool = False,
+                           store: ContentStore = None) -> Dict[str, Any]:
+    """Encode stage: compress one rendered token to its image file (or the content store)"""
+    token_id = rendered["token_id"]
+    with tracer.token(token_id):
+        compression_result = save_ultra_compressed(rendered["image"], f"generated_nfts/images/{token_id}.png",
+                                                   8, optimize_png, store)
+    # The next token can draw on this canvas
+    canvas_pool.release(rendered.pop("image"))
     
-    # Strategy 3: Reduce dimensions
-    new_width = int(img.width * 0.8)
-    new_height = int(img.height * 0.8)
-    resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    # Path, size, digest and PNG search cost of the written bytes go to the manifest only
+    image_filename = compression_result.pop("path")
+    size_bytes = compression_result.pop("size_bytes")
+    image_digest = compression_result.pop("digest")
+    png_search = {key: compression_result.pop(key) for key in ("png_saved_bytes", "png_cpu_ms")
+                  if key in compression_result}
+    rendered["metadata"]["compression"] = compression_result
+    if store is not None:
+        rendered["metadata"]["contentKey"] = image_digest
+    return {
+        "token_id": token_id,
+        "metadata": rendered["metadata"],
+        "compression": compression_result,
+        "png_search": png_search,
+        "image_path": image_filename,
+        "image_digest": image_digest,
+        "size_bytes": size_bytes
+    }
+
+def generate_all_optimized(resume: bool = False, encode_threads: int = 2, queue_size: int = 8,
+                           trace_path: str = None, indexed: bool = True, optimize_png: bool = False,
+                           content_store: bool = False):
+    """Generate all 4444 ultra-optimized organisms
     
-    resized.save(filename, "PNG", optimize=True, compress_level=9)
-    size = os.path.getsize(filename)
+    Tokens stream through render -> encode -> write stages with bounded
+    queues (see pipeline.py); encode_threads compress concurrently while the
+    next tokens render, and metadata and manifest records are written in
+    token order.
     
-    return {"success": size <= target_bytes, "method": "PNG-Resized", "size_kb": round(size/1024, 2)}
-
-def generate_all_optimized():
-    """Generate all 4444 ultra-optimized organisms"""
-    generator = UltraOptimizedFractalGenerator()
+    Finished tokens are recorded in generated_nfts/manifest.ndjson; with
+    resume=True only tokens missing from it (or with changed/corrupt files)
+    are rendered again.
+    
+    With trace_path, per-token stage timings are written there as NDJSON and
+    summarized at the end.
+    
+    By default tokens are drawn as palette indices with the cached era
+    palette; indexed=False draws in RGBA and quantizes every token instead.
+    
+    optimize_png brute-forces PNG filter and zlib strategies for every
+    candidate; bytes saved and CPU spent per token are recorded in the
+    manifest (pngSavedBytes, pngCpuMs) and totalled in the report.
+    
+    With content_store, images go to the content-addressed store in
+    generated_nfts/content (one file per distinct image, see
+    content_store.py); metadata carries each token's contentKey and the
+    dedupe ratio and colliding tokens are reported and written to
+    generated_nfts/content_index.json for validate-uniqueness.py.
+    """
+    generator = UltraOptimizedFractalGenerator(indexed=indexed, optimize_png=optimize_png)
+    if trace_path:
+        tracer.enable(trace_path)
+    reuse_pillow_blocks()
     
     os.makedirs("generated_nfts/images", exist_ok=True)
     os.makedirs("generated_nfts/metadata", exist_ok=True)
@@ -322,41 +505,98 @@ def generate_all_optimized():
         "under_8kb": 0,
         "total_size_mb": 0,
         "methods": {"PNG": 0, "PNG-8": 0, "PNG-Resized": 0},
+        "png_search": {"tokens": 0, "saved_bytes": 0, "cpu_s": 0},
         "average_size_kb": 0
     }
     
+    manifest = RunManifest("generated_nfts/manifest.ndjson", resume=resume)
+    metadata_sink = MetadataSink("generated_nfts/metadata", "generated_nfts/metadata.ndjson", resume=resume)
+    store = ContentStore("generated_nfts/content", "generated_nfts/content_index.json",
+                         resume=resume) if content_store else None
+    
+    token_ids = range(1, 4445)
+    finished = {}
+    if resume:
+        for token_id in token_ids:
+            entry = manifest.verified_entry(token_id, generator.params_hash(token_id))
+            if entry is not None:
+                finished[token_id] = entry
+                if store is not None and entry["image"].startswith(store.root):
+                    store.record(token_id, entry["imageHash"], entry["sizeBytes"])
+    skipped = len(finished)
+    
+    def render(token_id: int) -> Dict[str, Any]:
+        with tracer.token(token_id):
+            result = generator.generate_organism_fractal(token_id)
+        result["token_id"] = token_id
+        return result
+    
+    def write(encoded: Dict[str, Any]) -> Dict[str, Any]:
+        token_id = encoded["token_id"]
+        if store is not None:
+            store.record(token_id, encoded["image_digest"], encoded["size_bytes"])
+        metadata_filename, metadata_json = metadata_sink.write(token_id, encoded["metadata"])
+        manifest.record(
+            token_id=token_id,
+            params_digest=generator.params_hash(token_id),
+            image_path=encoded["image_path"],
+            image_digest=encoded["image_digest"],
+            size_bytes=encoded["size_bytes"],
+            image_format="png",
+            metadata_path=metadata_filename,
+            metadata_digest=bytes_sha256(metadata_json),
+            success=encoded["compression"]["success"],
+            method=encoded["compression"]["method"],
+            pngSavedBytes=encoded["png_search"].get("png_saved_bytes"),
+            pngCpuMs=encoded["png_search"].get("png_cpu_ms")
+        )
+        return manifest.entries[token_id]
+    
+    def encode(rendered: Dict[str, Any]) -> Dict[str, Any]:
+        return encode_optimized_token(rendered, optimize_png, store)
+    
+    pipeline = StagedPipeline([
+        ("encode", encode, encode_threads),
+        ("write", write, 1),
+    ], queue_size=queue_size)
+    written = pipeline.run(render(token_id) for token_id in token_ids if token_id not in finished)
+    
     start_time = time.time()
     
-    for token_id in range(1, 4445):
-        if token_id % 200 == 0:
-            elapsed = time.time() - start_time
-            rate = token_id / elapsed
-            eta = (4444 - token_id) / rate / 60
-            print(f"Progress: {token_id}/4444 ({token_id/4444*100:.1f}%) | "
-                  f"Rate: {rate:.1f}/sec | ETA: {eta:.1f}min")
-        
-        # Generate organism
-        result = generator.generate_organism_fractal(token_id)
-        
-        # Save with ultra compression
-        image_filename = f"generated_nfts/images/{token_id}.png"
-        compression_result = save_ultra_compressed(result["image"], image_filename, 8)
-        
-        # Update stats
-        file_size = os.path.getsize(image_filename)
-        stats["total_size_mb"] += file_size / (1024 * 1024)
-        
-        if compression_result["success"]:
-            stats["under_8kb"] += 1
-        
-        stats["methods"][compression_result["method"]] += 1
-        
-        # Save metadata
-        metadata_filename = f"generated_nfts/metadata/{token_id}.json"
-        result["metadata"]["compression"] = compression_result
-        
-        with open(metadata_filename, 'w') as f:
-            json.dump(result["metadata"], f, indent=2)
+    try:
+        for token_id in token_ids:
+            if token_id % 200 == 0:
+                elapsed = time.time() - start_time
+                rate = token_id / elapsed
+                eta = (4444 - token_id) / rate / 60
+                print(f"Progress: {token_id}/4444 ({token_id/4444*100:.1f}%) | "
+                      f"Rate: {rate:.1f}/sec | ETA: {eta:.1f}min")
+            
+            entry = finished.get(token_id)
+            if entry is None:
+                entry = next(written)
+            
+            # Update stats
+            stats["total_size_mb"] += entry["sizeBytes"] / (1024 * 1024)
+            
+            if entry["success"]:
+                stats["under_8kb"] += 1
+            
+            stats["methods"][entry["method"]] += 1
+            
+            if entry.get("pngCpuMs") is not None:
+                stats["png_search"]["tokens"] += 1
+                stats["png_search"]["saved_bytes"] += entry["pngSavedBytes"]
+                stats["png_search"]["cpu_s"] += entry["pngCpuMs"] / 1000
+    finally:
+        metadata_sink.close()
+        manifest.close()
+        if store is not None:
+            store.close()
+        tracer.close()
+    
+    if resume:
+        print(f"♻️  Resumed: {skipped}/4444 tokens verified and skipped")
     
     # Final statistics
     stats["average_size_kb"] = round((stats["total_size_mb"] * 1024) / 4444, 2)
@@ -371,10 +611,49 @@ def generate_all_optimized():
     print("\nCompression Methods:")
     for method, count in stats["methods"].items():
         print(f"  {method}: {count} images ({count/4444*100:.1f}%)")
+    png_search = stats["png_search"]
+    if png_search["tokens"]:
+        png_search["cpu_s"] = round(png_search["cpu_s"], 2)
+        print(f"\nPNG filter/zlib search: {png_search['saved_bytes'] / png_search['tokens']:.0f} bytes saved per token "
+              f"({png_search['saved_bytes'] / 1024:.1f}KB total), {png_search['cpu_s']:.1f}s CPU "
+              f"({png_search['cpu_s'] * 1000 / png_search['tokens']:.1f}ms per token)")
+    if store is not None:
+        stats["content_store"] = store.summary()
+        content = stats["content_store"]
+        print(f"\n🗄️  Content store: {content['tokens']} tokens -> {content['objects']} images "
+              f"(dedupe ratio {content['dedupeRatio']}, {content['savedBytes'] / 1024:.1f}KB not written)")
+        if content["collisions"]:
+            print(f"⚠️  {content['collidingTokens']} tokens share {content['collisions']} images "
+                  f"(see generated_nfts/content_index.json)")
+    if skipped < 4444:
+        print("\nPipeline stages:")
+        print(pipeline.format_summary())
+    if tracer.enabled:
+        print(f"\nStage timings (trace: {trace_path}):")
+        print(tracer.format_summary())
     
     # Save final stats
     with open("generated_nfts/optimization_report.json", 'w') as f:
         json.dump(stats, f, indent=2)
 
 if __name__ == "__main__":
-    generate_all_optimized()
+    parser = argparse.ArgumentParser(description="Ultra-optimized 4444 organism generation")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip tokens whose outputs still match generated_nfts/manifest.ndjson")
+    parser.add_argument("--encode-threads", type=int, default=2,
+                        help="threads in the encode stage (default: 2)")
+    parser.add_argument("--queue-size", type=int, default=8,
+                        help="tokens buffered between pipeline stages (default: 8)")
+    parser.add_argument("--trace", metavar="PATH", default=None,
+                        help="record per-token stage timings to this NDJSON file and print a summary")
+    parser.add_argument("--quantize", action="store_true",
+                        help="draw in RGBA and quantize every token instead of drawing palette indices")
+    parser.add_argument("--optimize-png", action="store_true",
+                        help="search PNG filter and zlib strategies for the smallest stream (costs CPU)")
+    parser.add_argument("--content-store", action="store_true",
+                        help="store images by content hash, writing identical images once")
+    args = parser.parse_args()
+    
+    generate_all_optimized(resume=args.resume, encode_threads=args.encode_threads, queue_size=args.queue_size,
+                           trace_path=args.trace, indexed=not args.quantize, optimize_png=args.optimize_png,
+                           content_store=args.content_store)
@@ -0,0 +1,116 @@
+"""
+Run manifest for resumable collection generation
+
+Each finished token is appended to an NDJSON journal as one complete line,
+so a crash can only ever lose the token that was being written. On resume
+the journal is replayed (later lines win, torn lines are ignored) and every
+entry is verified against the files on disk before the token is skipped.
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+
+MANIFEST_VERSION = 1
+
+
+def params_hash(params: Dict[str, Any]) -> str:
+    """Stable hash of a token's generation parameters"""
+    payload = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def bytes_sha256(data: bytes) -> str:
+    """SHA-256 hex digest of an in-memory buffer"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_sha256(path: str) -> Optional[str]:
+    """SHA-256 hex digest of a file, or None if it cannot be read"""
+    try:
+        with open(path, "rb") as f:
+            return bytes_sha256(f.read())
+    except OSError:
+        return None
+
+
+class RunManifest:
+    """Append-only record of finished tokens for one output directory"""
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.entries: Dict[int, Dict[str, Any]] = {}
+
+        if resume:
+            self._load()
+        else:
+            # Fresh run: start an empty journal
+            self._rewrite()
+
+        self._journal = open(self.path, "a", encoding="utf-8")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn write from an interrupted run
+                if entry.get("version") == MANIFEST_VERSION and "tokenId" in entry:
+                    self.entries[entry["tokenId"]] = entry
+
+    def _rewrite(self):
+        """Atomically replace the journal with the current entries"""
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for token_id in sorted(self.entries):
+                f.write(json.dumps(self.entries[token_id], separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def record(self, token_id: int, params_digest: str, image_path: str, image_digest: str,
+               size_bytes: int, image_format: str, metadata_path: str, metadata_digest: str,
+               **extra: Any):
+        """Append a finished token to the journal"""
+        entry = {
+            "version": MANIFEST_VERSION,
+            "tokenId": token_id,
+            "paramsHash": params_digest,
+            "image": image_path,
+            "imageHash": image_digest,
+            "sizeBytes": size_bytes,
+            "format": image_format,
+            "metadata": metadata_path,
+            "metadataHash": metadata_digest,
+        }
+        entry.update(extra)
+
+        self.entries[token_id] = entry
+        self._journal.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._journal.flush()
+
+    def verified_entry(self, token_id: int, params_digest: str) -> Optional[Dict[str, Any]]:
+        """Return the entry for a token if its parameters and files are unchanged"""
+        entry = self.entries.get(token_id)
+        if entry is None or entry["paramsHash"] != params_digest:
+            return None
+
+        if file_sha256(entry["image"]) != entry["imageHash"]:
+            return None
+        if file_sha256(entry["metadata"]) != entry["metadataHash"]:
+            return None
+
+        return entry
+
+    def close(self):
+        """Close the journal and compact it to one line per token"""
+        self._journal.close()
+        self._rewrite()
@@ -0,0 +1,245 @@
+"""
+Batched NumPy scanline rasterizer for primitive buffers
+
+rasterize_imagedraw paints a PrimitiveBuffer with one ImageDraw call per
+primitive, and ImageDraw overwrites RGBA pixels instead of blending them.
+rasterize_scanline fills the whole buffer with array operations instead:
+
+1. Thick lines become quads; every polygon edge is intersected with the
+   pixel-center rows it spans, and crossings are paired (even-odd) into
+   horizontal spans. Ellipses produce their spans analytically.
+2. Spans are expanded to (pixel, paint order) fragments and sorted.
+3. Fragments are composited source-over with premultiplied alpha, one
+   vectorized pass per overlap rank, so overlapping translucent primitives
+   blend in paint order.
+
+The Python-level work is a fixed number of array passes per token plus one
+pass per overlap rank, independent of the number of primitives.
+
+PrimitiveRecorder stands in for ImageDraw.Draw in code that issues
+individual draw calls (generate-fractal.py) and collects them into a
+PrimitiveBuffer for this rasterizer.
+"""
+
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from fractal_geometry import ELLIPSE, LINE, POLYGON, PrimitiveBuffer
+from instrumentation import tracer
+
+# "jit" is the Numba kernel in raster_jit.py, same pixels as "numpy"
+RASTERIZERS = ("imagedraw", "numpy", "jit")
+
+
+def _line_quads(coords: np.ndarray, widths: np.ndarray) -> np.ndarray:
+    """(N, 2, 2) segments with widths to (N, 4, 2) rectangles"""
+    start, end = coords[:, 0], coords[:, 1]
+    direction = end - start
+    length = np.hypot(direction[:, 0], direction[:, 1])
+    length[length == 0] = 1.0
+    # Unit normal scaled to half the width
+    normal = np.stack([-direction[:, 1], direction[:, 0]], axis=-1) / length[:, None]
+    normal *= (widths / 2.0)[:, None]
+    return np.stack([start + normal, end + normal, end - normal, start - normal], axis=1)
+
+
+def _polygon_spans(points: np.ndarray, count: np.ndarray, order: np.ndarray,
+                   width: int, height: int) -> Tuple[np.ndarray, ...]:
+    """Even-odd spans of polygons sampled at pixel centers
+
+    points is the flat (P, 2) vertex array, count the vertices per polygon
+    (in points order) and order each polygon's paint index. Returns rows,
+    first and end columns and paint index per span.
+    """
+    ends = np.cumsum(count)
+    starts = ends - count
+    # Each vertex connects to the next one, the last back to the first
+    following = np.arange(1, len(points) + 1)
+    following[ends - 1] = starts
+    owner = np.repeat(order, count)
+
+    x0, y0 = points[:, 0], points[:, 1]
+    x1, y1 = points[following, 0], points[following, 1]
+
+    # Rows whose center y + 0.5 lies in [min y, max y) of the edge
+    low = np.minimum(y0, y1)
+    high = np.maximum(y0, y1)
+    first_row = np.maximum(np.ceil(low - 0.5), 0).astype(np.int64)
+    end_row = np.minimum(np.ceil(high - 0.5), height).astype(np.int64)
+    rows_per_edge = np.maximum(end_row - first_row, 0)
+
+    edge = np.repeat(np.arange(len(points)), rows_per_edge)
+    row = first_row[edge] + _ramp(rows_per_edge)
+    t = (row + 0.5 - y0[edge]) / (y1[edge] - y0[edge])
+    x = x0[edge] + t * (x1[edge] - x0[edge])
+    span_owner = owner[edge]
+
+    # Group crossings by (polygon, row) in x order; consecutive pairs are inside
+    sort = np.lexsort((x, row, span_owner))
+    x = x[sort].reshape(-1, 2)
+    row = row[sort][::2]
+    span_owner = span_owner[sort][::2]
+
+    first_column = np.clip(np.ceil(x[:, 0] - 0.5), 0, width).astype(np.int64)
+    end_column = np.clip(np.ceil(x[:, 1] - 0.5), 0, width).astype(np.int64)
+    return row, first_column, end_column, span_owner
+
+
+def _ellipse_spans(boxes: np.ndarray, order: np.ndarray, width: int, height: int) -> Tuple[np.ndarray, ...]:
+    """Spans of axis-aligned filled ellipses given as (N, 4) x0, y0, x1, y1 boxes"""
+    center_x = (boxes[:, 0] + boxes[:, 2]) / 2
+    center_y = (boxes[:, 1] + boxes[:, 3]) / 2
+    radius_x = np.abs(boxes[:, 2] - boxes[:, 0]) / 2
+    radius_y = np.abs(boxes[:, 3] - boxes[:, 1]) / 2
+
+    first_row = np.maximum(np.ceil(center_y - radius_y - 0.5), 0).astype(np.int64)
+    end_row = np.minimum(np.ceil(center_y + radius_y - 0.5), height).astype(np.int64)
+    rows_per_ellipse = np.where(radius_y > 0, np.maximum(end_row - first_row, 0), 0)
+
+    index = np.repeat(np.arange(len(boxes)), rows_per_ellipse)
+    row = first_row[index] + _ramp(rows_per_ellipse)
+    dy = (row + 0.5 - center_y[index]) / radius_y[index]
+    half = radius_x[index] * np.sqrt(np.maximum(0.0, 1 - dy * dy))
+
+    first_column = np.clip(np.ceil(center_x[index] - half - 0.5), 0, width).astype(np.int64)
+    end_column = np.clip(np.ceil(center_x[index] + half - 0.5), 0, width).astype(np.int64)
+    return row, first_column, end_column, order[index]
+
+
+def _ramp(lengths: np.ndarray) -> np.ndarray:
+    """Concatenated aranges: [0..lengths[0]), [0..lengths[1]), ..."""
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.arange(total, dtype=np.int64) - offsets
+
+
+def buffer_spans(buffer: PrimitiveBuffer, width: int, height: int) -> Tuple[np.ndarray, ...]:
+    """Horizontal pixel spans (row, first column, end column, paint index) of a primitive buffer"""
+    data = buffer.finalize()
+    kinds = data["kinds"]
+    parts = []
+
+    for kind in (POLYGON, LINE, ELLIPSE):
+        selected = np.flatnonzero(kinds == kind)
+        if len(selected) == 0:
+            continue
+        counts = data["counts"][selected]
+        # Vertex indices of the selected primitives, in selection order
+        vertex = np.repeat(data["starts"][selected], counts) + _ramp(counts)
+        points = data["coords"][vertex]
+
+        if kind == ELLIPSE:
+            parts.append(_ellipse_spans(points.reshape(-1, 4), selected, width, height))
+            continue
+        if kind == LINE:
+            points = _line_quads(points.reshape(-1, 2, 2), data["widths"][selected]).reshape(-1, 2)
+            counts = np.full(len(selected), 4, dtype=np.int64)
+        parts.append(_polygon_spans(points, counts, selected, width, height))
+
+    if not parts:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    return tuple(np.concatenate(columns) for columns in zip(*parts))
+
+
+def rasterize_scanline(img: Image.Image, buffer: PrimitiveBuffer) -> Image.Image:
+    """Composite a primitive buffer over an RGBA image; returns a new image
+
+    Colors are blended source-over in paint order with premultiplied alpha,
+    so translucent primitives accumulate instead of overwriting each other.
+    """
+    width, height = img.size
+    with tracer.span("rasterize", "numpy"):
+        row, first_column, end_column, owner = buffer_spans(buffer, width, height)
+        lengths = np.maximum(end_column - first_column, 0)
+
+        # One fragment per covered pixel and primitive, sorted by pixel then paint order
+        pixel = np.repeat(row * width + first_column, lengths) + _ramp(lengths)
+        owner = np.repeat(owner, lengths)
+        primitives = max(1, len(buffer.finalize()["kinds"]))
+        sort = np.argsort(pixel * primitives + owner)
+        pixel = pixel[sort]
+        owner = owner[sort]
+        tracer.count("raster.fragments", len(pixel))
+
+        # Fragments covering the same pixel are consecutive, in paint order
+        new_pixel = np.empty(len(pixel), dtype=bool)
+        new_pixel[:1] = True
+        np.not_equal(pixel[1:], pixel[:-1], out=new_pixel[1:])
+        group_start = np.flatnonzero(new_pixel)
+        depth = np.diff(np.append(group_start, len(pixel)))
+
+        # Only covered pixels are blended, channel-major in premultiplied float
+        result = np.array(img if img.mode == "RGBA" else img.convert("RGBA")).reshape(-1, 4)
+        covered = pixel[group_start]
+        blended = result[covered].T.astype(np.float32)
+        blended[:3] *= blended[3] / 255
+
+        colors = buffer.finalize()["colors"].T.astype(np.float32)
+        transparency = 1 - colors[3] / 255
+        colors[:3] *= 1 - transparency
+
+        # Pass r blends the r-th fragment of every pixel covered more than r times
+        active = np.arange(len(group_start))
+        for rank in range(int(depth.max()) if len(depth) else 0):
+            source = owner[group_start[active] + rank]
+            keep = transparency[source]
+            for channel, values in zip(colors, blended):
+                values[active] = values[active] * keep + channel[source]
+            active = active[depth[active] > rank + 1]
+
+        alpha = blended[3]
+        for values in blended[:3]:
+            np.divide(values * 255, alpha, out=values, where=alpha > 0)
+        result[covered] = np.clip(np.rint(blended.T), 0, 255).astype(np.uint8)
+        result = result.reshape(height, width, 4)
+    return Image.fromarray(result, "RGBA")
+
+
+class PrimitiveRecorder:
+    """ImageDraw.Draw stand-in that records ellipse/line/polygon calls into a PrimitiveBuffer
+
+    Calls are numbered in issue order, which becomes the paint order.
+    Colors without alpha are opaque.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Tuple[int, int], list] = {}
+        self._next = 0
+
+    def _record(self, kind: int, xy: Sequence, fill, width: int = 1):
+        points = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        color = tuple(fill) + (255,) * (4 - len(fill))
+        self._calls.setdefault((kind, len(points)), []).append((self._next, points, color, width))
+        self._next += 1
+
+    def polygon(self, xy: Sequence, fill=None, outline=None):
+        if fill is not None:
+            self._record(POLYGON, xy, fill)
+
+    def line(self, xy: Sequence, fill=None, width: int = 1):
+        if fill is not None:
+            self._record(LINE, xy, fill, max(1, width))
+
+    def ellipse(self, xy: Sequence, fill=None, outline=None):
+        if fill is not None:
+            self._record(ELLIPSE, xy, fill)
+
+    def buffer(self) -> PrimitiveBuffer:
+        """Everything recorded so far as a PrimitiveBuffer"""
+        buffer = PrimitiveBuffer()
+        for (kind, _), calls in self._calls.items():
+            keys = np.array([call[0] for call in calls])
+            points = np.stack([call[1] for call in calls])
+            colors = np.array([call[2] for call in calls])
+            if kind == POLYGON:
+                buffer.add_polygons(keys, points, colors)
+            elif kind == LINE:
+                buffer.add_lines(keys, points, colors, np.array([call[3] for call in calls]))
+            else:
+                buffer.add_ellipses(keys, points.reshape(-1, 4), colors)
+        return buffer
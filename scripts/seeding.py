@@ -0,0 +1,28 @@
+"""
+Per-token random number streams shared by all fractal generators
+
+Every token (and every stage of its rendering) gets its own independent
+numpy Generator derived from the collection seed, so tokens can be rendered
+on any thread or process, in any order, with reproducible pixels.
+"""
+
+import numpy as np
+
+# Default collection seed used when a generator is not given one explicitly
+COLLECTION_SEED = 4444
+
+# Stable ids for each rendering stage; append new stages, never renumber
+STAGES = {
+    "params": 0,   # trait / parameter sampling
+    "effects": 1,  # post-processing effect factors
+    "hybrid": 2,   # cross-era hybrid overlay
+}
+
+
+def token_rng(token_id: int, stage: str, collection_seed: int = COLLECTION_SEED) -> np.random.Generator:
+    """Return an independent random Generator for one stage of one token"""
+    if stage not in STAGES:
+        raise ValueError(f"Unknown RNG stage '{stage}', expected one of {sorted(STAGES)}")
+
+    seed_sequence = np.random.SeedSequence([collection_seed, token_id, STAGES[stage]])
+    return np.random.default_rng(seed_sequence)
@@ -0,0 +1,158 @@
+"""
+Learned compression strategy prediction for size-targeted encoding
+
+The encoder ladder (WebP, then JPEG, then palette PNG, each searched for the
+highest quality under the byte target) costs several encodes for busy
+images. Tokens rendered with similar parameters land on similar rungs, so
+cheap image statistics plus the outcomes of tokens already encoded in the
+run are used to guess the winning strategy and quality up front. The guess
+is verified with a couple of encodes; on a miss the full ladder runs.
+"""
+
+import threading
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from encoders import encode_to_target, encode_with_hint
+
+# Images are reduced to this size before measuring statistics
+FEATURE_SIZE = 64
+
+
+def image_features(img: Image.Image, fractal_depth: int = 0) -> np.ndarray:
+    """Cheap statistics that track encoded size
+
+    Returns alpha coverage, edge density, log2 unique colors and depth,
+    measured on a FEATURE_SIZE thumbnail of the RGBA render.
+    """
+    thumb = np.asarray(img.convert('RGBA').resize((FEATURE_SIZE, FEATURE_SIZE), Image.Resampling.BILINEAR),
+                       dtype=np.int16)
+
+    alpha_coverage = float(np.count_nonzero(thumb[..., 3] > 8)) / thumb[..., 3].size
+
+    luma = thumb[..., :3].sum(axis=2)
+    edges = (np.abs(np.diff(luma, axis=0)) > 48).mean() + (np.abs(np.diff(luma, axis=1)) > 48).mean()
+
+    packed = (thumb[..., 0].astype(np.int32) >> 3) << 10 | (thumb[..., 1] >> 3) << 5 | (thumb[..., 2] >> 3)
+    unique_colors = np.log2(len(np.unique(packed)))
+
+    return np.array([alpha_coverage, edges / 2.0, unique_colors / 15.0, fractal_depth / 8.0])
+
+
+class StrategyPredictor:
+    """Nearest-neighbour guess of the ladder outcome, learned during the run
+
+    Outcomes are kept per category (organism pattern) and the k closest
+    feature vectors vote on the strategy; the predicted quality is the
+    median of the neighbours that agree. Until a category has warmup
+    samples no prediction is made.
+
+    Guesses must not depend on which encode thread finishes first, or runs
+    would differ in their bytes. So outcomes are observed in token order
+    (from the single-threaded write stage), and the token at position
+    sequence in the run is predicted from exactly the first sequence - lag
+    outcomes, waiting for the writer to catch up if it is further behind.
+    lag should exceed the tokens in flight between encode and write, so the
+    wait is rare. Safe to share between encode threads; only the history
+    lookups are serialized, not the encodes.
+    """
+
+    def __init__(self, k: int = 5, warmup: int = 8, max_history: int = 256, lag: int = 32):
+        self.k = k
+        self.warmup = warmup
+        self.max_history = max_history
+        self.lag = lag
+        # Past the allowed prefix at most lag newer outcomes are observed, so none of it is evicted early
+        self._history = defaultdict(lambda: deque(maxlen=max_history + lag))
+        self._observed = 0
+        self._condition = threading.Condition()
+
+        self.tokens = 0
+        self.encodes = 0
+        self.predictions = 0
+        self.hits = 0
+
+    def predict(self, features: np.ndarray, category: str,
+                limit: int) -> Optional[Tuple[Optional[int], Optional[int]]]:
+        """Return (strategy index or None for "nothing fits", quality), or None to run the ladder
+
+        Only the first limit outcomes observed in the run are used.
+        """
+        history = [sample for sample in self._history[category] if sample[0] < limit][-self.max_history:]
+        if len(history) < self.warmup:
+            return None
+
+        vectors = np.array([sample[1] for sample in history])
+        distances = np.abs(vectors - features).sum(axis=1)
+        nearest = [history[i] for i in np.argsort(distances, kind="stable")[:self.k]]
+
+        votes = defaultdict(list)
+        for _, _, strategy, quality in nearest:
+            votes[strategy].append(quality)
+        strategy, qualities = max(votes.items(), key=lambda item: len(item[1]))
+
+        qualities = [q for q in qualities if q is not None]
+        quality = int(np.median(qualities)) if qualities else None
+        return strategy, quality
+
+    def observe(self, features: np.ndarray, category: str, result: Dict[str, Any]):
+        """Learn from the strategy the ladder (or a verified guess) settled on
+
+        Must be called once per encoded token, in the order the tokens were
+        sequenced (see encode).
+        """
+        strategy = result["strategy"] if result["fits"] else None
+        with self._condition:
+            self._history[category].append((self._observed, features, strategy,
+                                            result["quality"] if result["fits"] else None))
+            self._observed += 1
+            self._condition.notify_all()
+
+    def encode(self, img: Image.Image, target_bytes: int, strategies: List[Dict[str, Any]],
+               features: np.ndarray, category: str, sequence: int) -> Dict[str, Any]:
+        """encode_to_target, starting from the predicted strategy when there is one
+
+        sequence is the token's position in the run (0, 1, ...); the caller
+        observes the result afterwards, in sequence order.
+        """
+        limit = max(0, sequence - self.lag)
+        with self._condition:
+            self._condition.wait_for(lambda: self._observed >= limit)
+            guess = self.predict(features, category, limit)
+        result = None
+        wasted = 0
+
+        if guess is not None:
+            attempt = encode_with_hint(img, target_bytes, strategies, *guess)
+            if attempt.get("miss"):
+                wasted = attempt["attempts"]
+            else:
+                result = attempt
+
+        if result is None:
+            result = encode_to_target(img, target_bytes, strategies)
+            result["attempts"] += wasted
+
+        result["predicted"] = guess is not None
+        result["prediction_hit"] = guess is not None and wasted == 0
+
+        with self._condition:
+            self.tokens += 1
+            self.encodes += result["attempts"]
+            self.predictions += result["predicted"]
+            self.hits += result["prediction_hit"]
+        return result
+
+    def summary(self) -> Dict[str, Any]:
+        """Hit rate and encodes per token for this predictor"""
+        return {
+            "tokens": self.tokens,
+            "encodes": self.encodes,
+            "encodes_per_token": self.encodes / self.tokens if self.tokens else 0.0,
+            "predictions": self.predictions,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.predictions if self.predictions else 0.0,
+        }
@@ -2,6 +2,8 @@ import json
 import os
 from collections import defaultdict
 
+from content_store import load_collisions
+
 def validate_nft_uniqueness():
     """Validate that all 4444 NFTs are truly unique"""
     
@@ -52,6 +54,16 @@ def validate_nft_uniqueness():
         parameter_combinations.add(param_hash)
         trait_combinations.add(trait_combo)
     
+    # Byte-identical images, as recorded by the content-addressed store
+    image_collisions = load_collisions("generated_nfts/content_index.json")
+    for content_key, token_ids in (image_collisions or {}).items():
+        for token_id in token_ids[1:]:
+            duplicates_found.append({
+                'token_id': token_id,
+                'duplicate_type': f'image (same bytes as token {token_ids[0]})',
+                'hash': content_key
+            })
+    
     # Report results
     total_loaded = len(unique_hashes)
     total_duplicates = len(duplicates_found)
@@ -60,6 +72,8 @@ def validate_nft_uniqueness():
     print(f"✅ Total NFTs validated: {total_loaded}/4444")
     print(f"🔍 Unique parameter combinations: {len(parameter_combinations)}")
     print(f"🎨 Unique trait combinations: {len(trait_combinations)}")
+    if image_collisions is not None:
+        print(f"🖼️  Image content collisions: {len(image_collisions)}")
     
     if total_duplicates == 0:
         print(f"🎉 SUCCESS: All {total_loaded} NFTs are completely unique!")
@@ -72,6 +86,7 @@ def validate_nft_uniqueness():
             "unique_parameters": len(parameter_combinations),
             "unique_traits": len(trait_combinations),
             "duplicates_found": 0,
+            "image_collisions": len(image_collisions) if image_collisions is not None else None,
             "uniqueness_guaranteed": True,
             "validation_passed": True
         }
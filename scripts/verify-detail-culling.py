@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Check the level-of-detail culling of fractal_geometry.expand_levels
+
+For a sample of tokens, every pattern family of AdvancedFractalGenerator is
+built without limits, with the generator's own DetailLimits and with
+min_extent_px raised to CULL_FACTOR times the extent of the smallest
+instance the full tree draws. Both limited builds must account for every
+primitive of the full tree (drawn plus culled off canvas, sub-pixel or by
+the budget), and the raised threshold must actually cull sub-pixel subtrees.
+
+Exits non-zero if any build fails either check.
+
+    python scripts/verify-detail-culling.py
+    python scripts/verify-detail-culling.py --tokens 1 2222 4444
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from fractal_geometry import _SUB_ORDER, DetailLimits, PrimitiveBuffer  # noqa: E402
+
+PATTERNS = ["bilateral", "radial", "spiral", "branching", "segmented", "crystalline"]
+# Spread over all seven eras
+DEFAULT_TOKENS = [1, 635, 1270, 1905, 2540, 3175, 3810, 4444]
+
+# The culling bound is a circle around an instance's anchor, not its drawn
+# box, so it can be about three times wider than what a leaf draws
+CULL_FACTOR = 4.0
+
+
+def load_generator_module():
+    """Import generate-4444-organisms.py as a module"""
+    spec = importlib.util.spec_from_file_location("generate_4444_organisms",
+                                                  os.path.join(SCRIPTS_DIR, "generate-4444-organisms.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["generate_4444_organisms"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def smallest_instance_extent(buffer: PrimitiveBuffer) -> float:
+    """Width or height (the larger) of the smallest box around one instance's primitives"""
+    data = buffer.finalize()
+    instances = data["keys"] // _SUB_ORDER
+    low = np.full((len(instances), 2), np.inf)
+    high = np.full((len(instances), 2), -np.inf)
+    for start, count, index in zip(data["starts"], data["counts"], range(len(instances))):
+        points = data["coords"][start:start + count]
+        low[index], high[index] = points.min(axis=0), points.max(axis=0)
+
+    # Primitives of one instance are adjacent in paint order
+    first = np.flatnonzero(np.r_[True, instances[1:] != instances[:-1]])
+    extent = np.maximum.reduceat(high, first) - np.minimum.reduceat(low, first)
+    return float(extent.max(axis=1).min())
+
+
+def culled(stats) -> int:
+    return stats["culledOffCanvas"] + stats["culledSubpixel"] + stats["culledByBudget"]
+
+
+def verify_culling(tokens) -> int:
+    """Build every pattern for each token at three limits; returns the number of failures"""
+    module = load_generator_module()
+    generator = module.AdvancedFractalGenerator()
+    default_limits = generator.detail_limits
+    failures = 0
+
+    for token_id in tokens:
+        params = generator.sample_parameters(token_id)
+        colors = [generator.hex_to_rgb(color) for color in module.GEOLOGIC_ERAS[params["era_name"]]["colors"]]
+
+        for pattern in PATTERNS:
+            def build(limits: DetailLimits) -> PrimitiveBuffer:
+                generator.detail_limits = limits
+                # draw=None only builds the geometry
+                return getattr(generator, f"draw_{pattern}_fractal")(
+                    None, colors, params["fractal_depth"], params["complexity"], params["rotation_factor"],
+                    params["scale_factor"], params["organism_name"])
+
+            full = build(None)
+            threshold = CULL_FACTOR * smallest_instance_extent(full)
+            raised = DetailLimits(default_limits.canvas_width, default_limits.canvas_height,
+                                  threshold, default_limits.primitive_budget)
+            problems = []
+            for label, limits in [("default", default_limits), (f"{threshold:.1f}px", raised)]:
+                stats = build(limits).stats
+                if stats["primitivesDrawn"] + culled(stats) != len(full):
+                    problems.append(f"{label}: {stats['primitivesDrawn']} drawn + {culled(stats)} culled "
+                                    f"!= {len(full)}")
+            if stats["culledSubpixel"] == 0:
+                problems.append(f"nothing culled below {threshold:.1f}px")
+
+            if problems:
+                failures += 1
+                print(f"  ❌ token {token_id:>4} {pattern:<12} {'; '.join(problems)}")
+            else:
+                print(f"  ✅ token {token_id:>4} {pattern:<12} {len(full):>6} primitives, "
+                      f"{stats['culledSubpixel']} culled below {threshold:.1f}px")
+    generator.detail_limits = default_limits
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check level-of-detail culling counts and sub-pixel culling")
+    parser.add_argument("--tokens", type=int, nargs="+", default=DEFAULT_TOKENS, help="token sample")
+    args = parser.parse_args()
+
+    failures = verify_culling(args.tokens)
+
+    if failures:
+        print(f"❌ {failures} build(s) failed")
+        sys.exit(1)
+    print("✅ Culling accounts for every primitive and culls sub-pixel subtrees")
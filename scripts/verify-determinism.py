@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Check that generate-4444-organisms.py writes the same images on every run
+
+Runs the full collection three times, each in its own scratch directory:
+serially, with a process pool (--workers) and serially again. The
+manifests' imageHash values must match token for token, which covers
+rendering order, the encode threads and the strategy predictor's learning
+order. Extra arguments after -- are passed to every run.
+
+Exits non-zero if any token's image differs.
+
+    python scripts/verify-determinism.py
+    python scripts/verify-determinism.py --workers 4 -- --encode-threads 4
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+GENERATOR = os.path.join(SCRIPTS_DIR, "generate-4444-organisms.py")
+
+
+def image_hashes(run_dir: str):
+    """tokenId -> imageHash from a run's manifest (the last entry per token wins)"""
+    hashes = {}
+    with open(os.path.join(run_dir, "generated_nfts", "manifest.ndjson"), "r") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                hashes[entry["tokenId"]] = entry["imageHash"]
+    return hashes
+
+
+def run_collection(label: str, run_dir: str, args):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, GENERATOR] + args, cwd=run_dir, check=True, stdout=subprocess.DEVNULL)
+    print(f"  {label:<24} {time.perf_counter() - started:7.1f}s")
+    return image_hashes(run_dir)
+
+
+def verify_determinism(workers: int, extra_args) -> int:
+    """Compare a serial, a pooled and a repeated serial run; returns the number of differing tokens"""
+    runs = [("serial", ["--workers", "1"]),
+            (f"--workers {workers}", ["--workers", str(workers)]),
+            ("serial (repeat)", ["--workers", "1"])]
+
+    with tempfile.TemporaryDirectory(prefix="verify-determinism-") as scratch:
+        results = []
+        for index, (label, args) in enumerate(runs):
+            run_dir = os.path.join(scratch, str(index))
+            os.makedirs(run_dir)
+            results.append((label, run_collection(label, run_dir, args + extra_args)))
+
+    (reference_label, reference), others = results[0], results[1:]
+    differing = set()
+    for label, hashes in others:
+        if hashes.keys() != reference.keys():
+            print(f"  ❌ {label}: {len(hashes)} tokens in the manifest, {reference_label} has {len(reference)}")
+        mismatched = sorted(token_id for token_id in reference if hashes.get(token_id) != reference[token_id])
+        if mismatched:
+            print(f"  ❌ {label}: {len(mismatched)} tokens differ from {reference_label}, "
+                  f"first {mismatched[:10]}")
+        differing.update(mismatched)
+    return len(differing)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that collection runs are byte-identical")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes for the pooled run (default: 4)")
+    parser.add_argument("extra", nargs=argparse.REMAINDER, help="-- followed by arguments for every run")
+    args = parser.parse_args()
+    extra_args = args.extra[1:] if args.extra[:1] == ["--"] else args.extra
+
+    print(f"Running the collection 3 times (serial, --workers {args.workers}, serial)")
+    differing = verify_determinism(args.workers, extra_args)
+
+    if differing:
+        print(f"❌ {differing} token(s) differ between runs")
+        sys.exit(1)
+    print("✅ All runs wrote identical images")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Check that the compositing rasterizer backends produce identical pixels
+
+For a sample of tokens, every pattern family of AdvancedFractalGenerator is
+built as a primitive buffer on the token's era background and rasterized
+with the vectorized NumPy backend (scanline.rasterize_scanline) and the
+Numba kernel (raster_jit.rasterize_jit). Without Numba installed the kernel
+runs as plain Python, which is slow, so use a smaller --size there.
+
+Exits non-zero if any image differs.
+
+    python scripts/verify-render-backends.py
+    python scripts/verify-render-backends.py --size 128 --tokens 1 2222 4444
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPTS_DIR)
+
+import raster_jit  # noqa: E402
+from scanline import rasterize_scanline  # noqa: E402
+
+PATTERNS = ["bilateral", "radial", "spiral", "branching", "segmented", "crystalline"]
+# Spread over all seven eras
+DEFAULT_TOKENS = [1, 635, 1270, 1905, 2540, 3175, 3810, 4444]
+
+
+def load_generator_module():
+    """Import generate-4444-organisms.py as a module"""
+    spec = importlib.util.spec_from_file_location("generate_4444_organisms",
+                                                  os.path.join(SCRIPTS_DIR, "generate-4444-organisms.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["generate_4444_organisms"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def verify_backends(tokens, size: int) -> int:
+    """Compare both backends on every pattern for each token; returns the number of mismatches"""
+    module = load_generator_module()
+    generator = module.AdvancedFractalGenerator(width=size, height=size)
+    mismatches = 0
+
+    for token_id in tokens:
+        params = generator.sample_parameters(token_id)
+        colors = [generator.hex_to_rgb(color) for color in module.GEOLOGIC_ERAS[params["era_name"]]["colors"]]
+        background = generator.create_background_gradient(colors, params["color_variant"])
+
+        for pattern in PATTERNS:
+            # draw=None only builds the geometry
+            buffer = getattr(generator, f"draw_{pattern}_fractal")(
+                None, colors, params["fractal_depth"], params["complexity"], params["rotation_factor"],
+                params["scale_factor"], params["organism_name"])
+
+            expected = np.asarray(rasterize_scanline(background, buffer))
+            actual = np.asarray(raster_jit.rasterize_jit(background, buffer, fallback=False))
+
+            if np.array_equal(expected, actual):
+                print(f"  ✅ token {token_id:>4} {pattern:<12} {len(buffer):>6} primitives")
+                continue
+            mismatches += 1
+            differing = np.any(expected != actual, axis=-1)
+            worst = int(np.abs(expected.astype(np.int16) - actual).max())
+            print(f"  ❌ token {token_id:>4} {pattern:<12} {int(differing.sum())} pixels differ (max {worst})")
+
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the NumPy and Numba rasterizers produce identical pixels")
+    parser.add_argument("--tokens", type=int, nargs="+", default=DEFAULT_TOKENS, help="token sample")
+    parser.add_argument("--size", type=int, default=None,
+                        help="canvas size (default: 512 with Numba, 128 when the kernel runs as Python)")
+    args = parser.parse_args()
+
+    size = args.size or (512 if raster_jit.JIT_AVAILABLE else 128)
+    kernel = "Numba-compiled" if raster_jit.JIT_AVAILABLE else "interpreted (Numba not installed)"
+    print(f"Comparing rasterizers on {len(args.tokens)} tokens at {size}x{size}, kernel {kernel}")
+
+    started = time.perf_counter()
+    mismatches = verify_backends(args.tokens, size)
+    print(f"\nChecked {len(args.tokens) * len(PATTERNS)} images in {time.perf_counter() - started:.1f}s")
+
+    if mismatches:
+        print(f"❌ {mismatches} image(s) differ between backends")
+        sys.exit(1)
+    print("✅ Backends produce identical pixels")